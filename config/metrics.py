@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import defaultdict
+from ipaddress import ip_address, ip_network
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_HELP = {
+    "http_requests_total": ("counter", "Число запросов по представлению и коду ответа"),
+    "http_request_duration_seconds": ("histogram", "Время обработки запроса"),
+    "http_request_sql_queries_total": ("counter", "Число SQL-запросов"),
+    "http_request_sql_duration_seconds_total": ("counter", "Суммарное время SQL-запросов"),
+}
+
+REDIS_KEY = "metrics:http"
+
+
+def sample_sort_key(key):
+    """Порядок выборок: по имени и меткам, а корзины гистограммы — по числовому le, +Inf последней"""
+
+    labels, _, bound = key.partition(',le="')
+    return (labels, float(bound.rstrip('"}'))) if bound else (key, 0.0)
+
+
+class MetricsRegistry:
+    """Накопитель метрик процесса.
+
+    Значения копятся локально и раз в METRICS_FLUSH_INTERVAL секунд одним
+    пайплайном сбрасываются в общий хэш Redis, где суммируются по всем
+    воркерам gunicorn. Без METRICS_REDIS_URL отдаются метрики только этого процесса.
+    """
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+        self.client = None
+
+    def get_client(self):
+        if self.client is None and settings.METRICS_REDIS_URL:
+            self.client = redis.Redis.from_url(settings.METRICS_REDIS_URL)
+        return self.client
+
+    def observe(self, view, status_code, duration, query_count, query_duration):
+        labels = f'view="{view}"'
+        with self.lock:
+            self.values[f'http_requests_total{{{labels},status="{status_code}"}}'] += 1
+            for bucket in LATENCY_BUCKETS:
+                if duration <= bucket:
+                    self.values[f'http_request_duration_seconds_bucket{{{labels},le="{bucket}"}}'] += 1
+            self.values[f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] += 1
+            self.values[f"http_request_duration_seconds_sum{{{labels}}}"] += duration
+            self.values[f"http_request_duration_seconds_count{{{labels}}}"] += 1
+            self.values[f"http_request_sql_queries_total{{{labels}}}"] += query_count
+            self.values[f"http_request_sql_duration_seconds_total{{{labels}}}"] += query_duration
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        client = self.get_client()
+        if client is None:
+            return
+        with self.lock:
+            values, self.values = self.values, defaultdict(float)
+            self.flushed_at = time.monotonic()
+        pipeline = client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.hincrbyfloat(REDIS_KEY, key, value)
+        pipeline.execute()
+
+    def collect(self):
+        client = self.get_client()
+        if client is None:
+            with self.lock:
+                return dict(self.values)
+        self.flush()
+        return {key.decode(): float(value) for key, value in client.hgetall(REDIS_KEY).items()}
+
+    def export(self):
+        """Метрики в текстовом формате Prometheus"""
+
+        samples = defaultdict(list)
+        for key, value in sorted(self.collect().items(), key=lambda item: sample_sort_key(item[0])):
+            name = key.split("{", 1)[0]
+            family = next((metric for metric in METRICS_HELP if name.startswith(metric)), name)
+            samples[family].append(f"{key} {value:g}")
+        lines = []
+        for family, (metric_type, help_text) in METRICS_HELP.items():
+            if samples[family]:
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} {metric_type}")
+                lines.extend(samples[family])
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """Обёртка выполнения SQL: считает число запросов и их суммарное время"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """Задержка, число и время SQL-запросов по каждому представлению.
+
+    При выключенном METRICS_ENABLED исключается из цепочки middleware целиком.
+    Поддерживает и ASGI: асинхронные представления не переводятся в синхронный режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        # Соединения с БД привязаны к потоку: обёртку ставим в потоке, где sync_to_async выполняет
+        # запросы этого HTTP-запроса (синхронные представления и асинхронный ORM)
+        await sync_to_async(add_execute_wrapper)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_execute_wrapper)(timer)
+        self.observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def observe(self, request, response, duration, timer):
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else "unresolved",
+            response.status_code,
+            duration,
+            timer.count,
+            timer.duration,
+        )
+
+
+def is_metrics_client(request):
+    """Запрос пришёл из сети METRICS_ALLOWED_NETWORKS (по умолчанию локальные и внутренние адреса)"""
+
+    try:
+        address = ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    # Снаружи эндпоинт закрыт и в nginx; проверка адреса защищает от прямого обращения к приложению
+    if not settings.METRICS_ENABLED or not is_metrics_client(request):
+        raise Http404
+    return HttpResponse(registry.export(), content_type="text/plain; version=0.0.4")
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import SwaggerYAMLRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+API_INFO = openapi.Info(
+    title="API Documentation",
+    default_version='v1',
+    description="Your API description",
+    terms_of_service="https://www.example.com/policies/terms/",
+    contact=openapi.Contact(email="contact@example.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+SCHEMA_FILES = {
+    "json": ("schema.json", "application/json", OpenAPICodecJson),
+    "yaml": ("schema.yaml", "application/yaml", OpenAPICodecYaml),
+}
+VERSION_FILE = "version"
+
+logger = logging.getLogger(__name__)
+
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+
+@lru_cache(maxsize=None)
+def get_code_version():
+    """Версия кода для схемы: CODE_VERSION из окружения или хэш исходников проекта и версий drf/drf_yasg.
+
+    Код не меняется без перезапуска процесса, поэтому версия считается один раз.
+    """
+
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha256(f"{drf_yasg.__version__}:{rest_framework.VERSION}".encode())
+    base_dir = Path(settings.BASE_DIR)
+    roots = {Path(app.path) for app in apps.get_app_configs() if Path(app.path).is_relative_to(base_dir)}
+    roots.add(base_dir / settings.ROOT_URLCONF.split(".")[0])
+    for path in sorted(file for root in roots for file in root.rglob("*.py")):
+        digest.update(str(path.relative_to(base_dir)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def render_schema():
+    """Генерирует схему один раз и кодирует её во все форматы"""
+
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    return {
+        schema_format: codec_class(validators=[]).encode(schema)
+        for schema_format, (_, _, codec_class) in SCHEMA_FILES.items()
+    }
+
+
+def write_schema_files(contents, directory=None):
+    """Записывает схему в JSON и YAML рядом с файлом версии"""
+
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for schema_format, (filename, _, _) in SCHEMA_FILES.items():
+        write_atomic(directory / filename, contents[schema_format])
+    # Версия пишется последней: файл версии подтверждает, что схема уже на месте
+    write_atomic(directory / VERSION_FILE, get_code_version().encode())
+    return directory
+
+
+def write_atomic(path, content):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+class SchemaArtifacts:
+    """Схема из файлов generate_openapi_schema, закэшированная в памяти процесса.
+
+    Если версия в файлах не совпадает с версией кода (или файлов нет), схема
+    генерируется заново и перезаписывается; дальше запросы отдают готовые байты
+    без разбора представлений и сериализаторов.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.contents = {}
+        self.lock = threading.Lock()
+
+    def get(self, schema_format):
+        version = get_code_version()
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.contents = self.load(version) or self.regenerate()
+                    self.version = version
+        return self.contents[schema_format]
+
+    def regenerate(self):
+        contents = render_schema()
+        try:
+            write_schema_files(contents)
+        except OSError:
+            # Схема всё равно закэширована в памяти процесса; nginx продолжит отдавать старый файл
+            logger.warning("Не удалось записать схему API в %s", settings.OPENAPI_SCHEMA_DIR, exc_info=True)
+        return contents
+
+    def load(self, version):
+        directory = Path(settings.OPENAPI_SCHEMA_DIR)
+        try:
+            if (directory / VERSION_FILE).read_text() != version:
+                return None
+            return {
+                schema_format: (directory / filename).read_bytes()
+                for schema_format, (filename, _, _) in SCHEMA_FILES.items()
+            }
+        except FileNotFoundError:
+            return None
+
+
+schema_artifacts = SchemaArtifacts()
+
+
+class CachedSchemaView(schema_view):
+    """Схема API отдаётся из готового артефакта; интерфейсы Swagger и ReDoc — как раньше"""
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        if renderer.media_type.startswith("text/html"):
+            return super().get(request, version, format)
+        schema_format = "yaml" if isinstance(renderer, SwaggerYAMLRenderer) else "json"
+        response = HttpResponse(
+            schema_artifacts.get(schema_format),
+            content_type=SCHEMA_FILES[schema_format][1],
+        )
+        response["ETag"] = f'"{get_code_version()}"'
+        return response
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -63,7 +64,7 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -125,7 +126,7 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -137,6 +138,9 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Сколько секунд живёт снимок пользователя в кэше JWT-аутентификации
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 30))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",  # Замените на адрес вашего фронтенд-сервера
 ]
@@ -147,20 +151,90 @@ CORS_ALLOW_ALL_ORIGINS = False
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1",
+        "LOCATION": os.getenv("LOCATION", "redis://127.0.0.1:6379/1"),
     }
 }
 
+if "test" in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Кэш публичной ленты привычек: время жизни страницы и размер LRU в памяти процесса
+PUBLIC_FEED_CACHE_TIMEOUT = int(os.getenv("PUBLIC_FEED_CACHE_TIMEOUT", 300))
+PUBLIC_FEED_LOCAL_CACHE_SIZE = int(os.getenv("PUBLIC_FEED_LOCAL_CACHE_SIZE", 256))
+
+# Схема API: готовые файлы generate_openapi_schema в статике (их отдаёт nginx) и версия кода,
+# при смене которой схема генерируется заново. Без CODE_VERSION версия — хэш исходников
+OPENAPI_SCHEMA_DIR = Path(STATIC_ROOT) / "openapi"
+CODE_VERSION = os.getenv("CODE_VERSION", "")
+# Интерфейсы Swagger и ReDoc загружают схему из готового артефакта, а не генерируют её сами
+SWAGGER_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+REDOC_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+
+# Бюджет холодного импорта веб- и celery-процесса (profile_startup, тест бюджета), с
+STARTUP_IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", 1.5))
+
+# Асинхронные версии списка, публичной ленты и просмотра привычки для запуска под ASGI (uvicorn)
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS") == "1"
+
+# Метрики запросов для Prometheus (/metrics). Без METRICS_REDIS_URL считаются по процессу
+METRICS_ENABLED = os.getenv("METRICS_ENABLED") == "1"
+METRICS_REDIS_URL = os.getenv("METRICS_REDIS_URL", "")
+METRICS_FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+# Сети, из которых Prometheus может забирать /metrics напрямую у приложения
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    "METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+).split(",")
+
 # Телеграм
 TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 TELEGRAM_URL_BOT = 'https://api.telegram.org/bot'
 TELEGRAM_API_TOKEN = os.getenv('TELEGRAM_API_TOKEN')  # Тут Ваш токен, который выдал - BotFather
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", 5))  # Ожидание ответа Bot API, с
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", 3))
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", 20))  # Параллельных запросов к Bot API
+TELEGRAM_RATE_LIMIT = 30  # Сообщений в секунду на бота (лимит Telegram)
+TELEGRAM_CHAT_RATE_LIMIT = 1  # Сообщений в секунду в один чат
+# Вебхук: адрес для setWebhook, секрет из заголовка X-Telegram-Bot-Api-Secret-Token и имя бота для ссылок
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+TELEGRAM_BOT_USERNAME = os.getenv("TELEGRAM_BOT_USERNAME", "")
+TELEGRAM_LINK_CODE_TTL = int(os.getenv("TELEGRAM_LINK_CODE_TTL", 600))  # Срок жизни кода привязки, с
+TELEGRAM_UPDATES_BATCH_DELAY = int(os.getenv("TELEGRAM_UPDATES_BATCH_DELAY", 2))  # Сбор пачки обновлений, с
+TELEGRAM_UPDATES_BATCH_SIZE = int(os.getenv("TELEGRAM_UPDATES_BATCH_SIZE", 500))
+# Повторы при сетевых ошибках, 429 и 5xx: пауза TELEGRAM_RETRY_BACKOFF * 2^n или retry_after от Telegram;
+# паузы длиннее TELEGRAM_RETRY_MAX_DELAY не выдерживаются, отправка переносится на следующий тик
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 3))
+TELEGRAM_RETRY_BACKOFF = float(os.getenv("TELEGRAM_RETRY_BACKOFF", 0.5))
+TELEGRAM_RETRY_MAX_DELAY = float(os.getenv("TELEGRAM_RETRY_MAX_DELAY", 10))
+# Предохранитель: после стольких сбоев подряд за окно (с) отправка приостанавливается на паузу (с)
+TELEGRAM_CIRCUIT_THRESHOLD = int(os.getenv("TELEGRAM_CIRCUIT_THRESHOLD", 20))
+TELEGRAM_CIRCUIT_WINDOW = int(os.getenv("TELEGRAM_CIRCUIT_WINDOW", 60))
+TELEGRAM_CIRCUIT_COOLDOWN = int(os.getenv("TELEGRAM_CIRCUIT_COOLDOWN", 60))
+
+# Настройки для выполнения периодических задач. При запущенном run_reminder_scheduler
+# проход beat только страхует планировщик, и интервал можно увеличить
+REMINDER_TICK_INTERVAL = timedelta(seconds=int(os.getenv("REMINDER_TICK_INTERVAL", 60)))
 
-# Настройки для выполнения периодических задач
 CELERY_BEAT_SCHEDULE = {
-    'check_user_habits_and_send': {
-        'task': 'habits.tasks.check_user_habits_and_send',  # Путь к задаче
-        'schedule': timedelta(minutes=1),  # Расписание выполнения задачи (например, каждые 10 минут)
+    'telegram_notification': {
+        'task': 'habits.tasks.telegram_notification',  # Путь к задаче
+        'schedule': REMINDER_TICK_INTERVAL,  # Расписание выполнения задачи (например, каждые 10 минут)
+    },
+    'rebuild_reminder_load': {
+        'task': 'habits.tasks.rebuild_reminder_load_buckets',
+        'schedule': timedelta(days=1),
+    },
+    'recompute_fire_times': {
+        'task': 'habits.tasks.recompute_fire_times',
+        'schedule': timedelta(hours=6),
+    },
+    'prune_reminder_deliveries': {
+        'task': 'habits.tasks.prune_reminder_deliveries',
+        'schedule': timedelta(days=1),
     },
 }
 
@@ -168,3 +242,26 @@ CELERY_BEAT_SCHEDULE = {
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+
+# Рассылка напоминаний: число шардов (по id пользователя) и размер порции на одну подзадачу
+REMINDER_SHARD_COUNT = int(os.getenv("REMINDER_SHARD_COUNT", 8))
+REMINDER_CHUNK_SIZE = int(os.getenv("REMINDER_CHUNK_SIZE", 500))
+# Временно не доставленное напоминание повторяется следующими тиками, пока не исчерпаны попытки и не устарело
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", 5))
+REMINDER_MAX_AGE = timedelta(minutes=int(os.getenv("REMINDER_MAX_AGE_MINUTES", 60)))
+# Запись, которая отправляется дольше этого, считается брошенной упавшим воркером и возвращается в очередь
+REMINDER_SENDING_TIMEOUT = timedelta(minutes=int(os.getenv("REMINDER_SENDING_TIMEOUT_MINUTES", 10)))
+# Отправленные и окончательно не доставленные записи журнала хранятся столько дней
+REMINDER_DELIVERY_RETENTION = timedelta(days=int(os.getenv("REMINDER_DELIVERY_RETENTION_DAYS", 30)))
+# Насколько вперёд искать переходы на летнее время: не меньше максимальной периодичности привычки
+REMINDER_DST_HORIZON = timedelta(days=8)
+
+# Планировщик напоминаний (run_reminder_scheduler): лента изменений в Redis, окно в памяти
+# на REMINDER_SCHEDULER_HORIZON секунд, но не больше REMINDER_SCHEDULER_MAX_ENTRIES привычек
+REMINDER_SCHEDULER_REDIS_URL = os.getenv("REMINDER_SCHEDULER_REDIS_URL", "")
+REMINDER_SCHEDULER_HORIZON = int(os.getenv("REMINDER_SCHEDULER_HORIZON", 3600))
+REMINDER_SCHEDULER_MAX_ENTRIES = int(os.getenv("REMINDER_SCHEDULER_MAX_ENTRIES", 200_000))
+REMINDER_SCHEDULER_REFRESH = int(os.getenv("REMINDER_SCHEDULER_REFRESH", 300))
+
+if "test" in sys.argv:
+    CELERY_TASK_ALWAYS_EAGER = True
@@ -1,35 +1,34 @@
 from django.contrib import admin
 from django.urls import include, path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API Documentation",
-        default_version='v1',
-        description="Your API description",
-        terms_of_service="https://www.example.com/policies/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+from config.metrics import metrics_view
+
+
+def lazy_schema_view(method, *args):
+    """Представление схемы API, импортирующее drf_yasg при первом запросе, а не при загрузке URL"""
+
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *view_args, **view_kwargs):
+        nonlocal view
+        if view is None:
+            view = getattr(import_string("config.openapi.CachedSchemaView"), method)(*args)
+        return view(request, *view_args, **view_kwargs)
+
+    return wrapper
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("habits/", include("habits.urls", namespace="habits")),
     path("users/", include("users.urls", namespace="users")),
-    path(
-        "swagger<format>/", schema_view.without_ui(cache_timeout=0), name="schema-json"
-    ),
-    path(
-        "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path("metrics/", metrics_view, name="metrics"),
+    path("swagger<format>/", lazy_schema_view("without_ui"), name="schema-json"),
+    path("swagger/", lazy_schema_view("with_ui", "swagger"), name="schema-swagger-ui"),
+    path("redoc/", lazy_schema_view("with_ui", "redoc"), name="schema-redoc"),
 ]
 #     # Другие URL-шаблоны вашего проекта...
 #     path('admin/', admin.site.urls),
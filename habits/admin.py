@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Habit
+from .models import Habit, HabitCompletion, ReminderDelivery, ReminderLoadBucket, ReminderTick, TelegramDeadLetter
 
 
 @admin.register(Habit)
@@ -17,4 +17,67 @@ class HabitAdmin(admin.ModelAdmin):
         "reward",
         "time_to_complete",
         "is_published",
+        "next_fire_at",
+        "streak",
+        "last_completed_at",
     )
+    readonly_fields = (
+        "next_fire_at",
+        "utc_minute",
+        "streak",
+        "completed_periods",
+        "first_completed_at",
+        "last_completed_at",
+    )
+
+    def save_model(self, request, obj, form, change):
+        if not change or {"time", "periodicity"} & set(form.changed_data):
+            obj.schedule()
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(HabitCompletion)
+class HabitCompletionAdmin(admin.ModelAdmin):
+    list_display = ("id", "habit", "period", "completed_at")
+    raw_id_fields = ("habit",)
+
+
+@admin.register(ReminderDelivery)
+class ReminderDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("id", "habit", "scheduled_at", "sent_at", "status", "attempts", "error")
+    list_filter = ("status",)
+    raw_id_fields = ("habit",)
+
+
+@admin.register(ReminderTick)
+class ReminderTickAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "duration",
+        "overran",
+        "habits_scanned",
+        "attempted",
+        "sent",
+        "failed",
+        "latency_p95",
+        "lag_p95",
+        "lag_max",
+    )
+    date_hierarchy = "started_at"
+
+    @admin.display(boolean=True, description="Не уложился в интервал")
+    def overran(self, obj):
+        return obj.overran
+
+
+@admin.register(ReminderLoadBucket)
+class ReminderLoadBucketAdmin(admin.ModelAdmin):
+    list_display = ("minute", "periodicity", "count")
+    list_filter = ("periodicity",)
+    ordering = ("-count",)
+
+
+@admin.register(TelegramDeadLetter)
+class TelegramDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ("chat_id", "status_code", "error", "created_at", "updated_at")
+    search_fields = ("chat_id",)
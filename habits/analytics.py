@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from habits.models import Habit, ReminderLoadBucket
+
+MINUTES_PER_DAY = 24 * 60
+REMINDER_LOAD_CACHE_KEY = "habits:reminder_load:{resolution}"
+REMINDER_LOAD_CACHE_TIMEOUT = 60
+
+
+def change_reminder_load(minute, periodicity, delta):
+    """Атомарно меняет счётчик одной корзины нагрузки"""
+
+    buckets = ReminderLoadBucket.objects.filter(minute=minute, periodicity=periodicity)
+    if buckets.update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            ReminderLoadBucket.objects.create(minute=minute, periodicity=periodicity, count=delta)
+    except IntegrityError:
+        buckets.update(count=F("count") + delta)
+
+
+def move_reminder_load(moves):
+    """Переносит привычки между корзинами: moves — тройки (старая минута, новая минута, периодичность)"""
+
+    deltas = Counter()
+    for old_minute, new_minute, periodicity in moves:
+        if old_minute == new_minute:
+            continue
+        if old_minute is not None:
+            deltas[old_minute, periodicity] -= 1
+        if new_minute is not None:
+            deltas[new_minute, periodicity] += 1
+    for (minute, periodicity), delta in deltas.items():
+        if delta:
+            change_reminder_load(minute, periodicity, delta)
+
+
+def rebuild_reminder_load():
+    """Полный пересчёт корзин: группировка выполняется в БД, наружу выходит не больше 1440 × 7 строк"""
+
+    grouped = (
+        Habit.objects.filter(utc_minute__isnull=False)
+        .values("utc_minute", "periodicity")
+        .annotate(count=Count("id"))
+        .values_list("utc_minute", "periodicity", "count")
+    )
+    buckets = [
+        ReminderLoadBucket(minute=minute, periodicity=periodicity, count=count)
+        for minute, periodicity, count in grouped
+    ]
+    with transaction.atomic():
+        ReminderLoadBucket.objects.all().delete()
+        ReminderLoadBucket.objects.bulk_create(buckets, batch_size=2000)
+    cache.delete_many([REMINDER_LOAD_CACHE_KEY.format(resolution=name) for name in ("minute", "hour")])
+    return len(buckets)
+
+
+def get_reminder_load(resolution="minute"):
+    """Нагрузка напоминаний по минутам или часам суток по UTC.
+
+    expected — среднее число напоминаний в сутки (привычка с периодичностью p
+    даёт 1/p), peak — худший случай, когда совпали все периоды.
+    """
+
+    key = REMINDER_LOAD_CACHE_KEY.format(resolution=resolution)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    # numpy нужен только здесь: импорт при первом обращении не замедляет старт веб- и celery-процессов
+    import numpy as np
+
+    rows = np.array(
+        list(ReminderLoadBucket.objects.filter(count__gt=0).values_list("minute", "periodicity", "count")),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    minutes, periodicity, counts = rows[:, 0], np.maximum(rows[:, 1], 1), rows[:, 2]
+    expected = np.bincount(minutes, weights=counts / periodicity, minlength=MINUTES_PER_DAY)
+    peak = np.bincount(minutes, weights=counts, minlength=MINUTES_PER_DAY)
+    if resolution == "hour":
+        expected = expected.reshape(24, 60).sum(axis=1)
+        peak = peak.reshape(24, 60).sum(axis=1)
+
+    busiest = int(np.argmax(peak)) if peak.any() else None
+    result = {
+        "resolution": resolution,
+        "expected": np.round(expected, 3).tolist(),
+        "peak": peak.astype(int).tolist(),
+        "expected_per_day": round(float(expected.sum()), 3),
+        "busiest_slot": busiest,
+        "busiest_peak": int(peak[busiest]) if busiest is not None else 0,
+    }
+    cache.set(key, result, REMINDER_LOAD_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,170 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.pagination import Cursor
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from habits.cache import (
+    PUBLIC_FEED_VERSION_KEY,
+    get_version,
+    habit_version_key,
+    public_feed_cache,
+    user_habits_version_key,
+)
+from habits.models import Habit
+from habits.paginators import MyCursorPagination
+from habits.serializers import HabitSerializer, get_expand_fields
+from habits.views import etag_matches, make_etag, public_feed_cache_key
+
+
+async def paginate_by_id(queryset, request):
+    """Асинхронная пагинация по курсору с той же кодировкой курсоров, что у MyCursorPagination.
+
+    Курсоры взаимозаменяемы с синхронными представлениями: сортировка по
+    уникальному id, поэтому смещение внутри позиции всегда нулевое.
+    """
+
+    paginator = MyCursorPagination()
+    paginator.request = request
+    paginator.base_url = request.build_absolute_uri()
+    page_size = paginator.get_page_size(request)
+    cursor = paginator.decode_cursor(request)
+    position = int(cursor.position) if cursor and cursor.position is not None else None
+    reverse = bool(cursor and cursor.reverse)
+    if position is not None:
+        queryset = queryset.filter(id__lt=position) if reverse else queryset.filter(id__gt=position)
+    queryset = queryset.order_by("-id" if reverse else "id")
+    page = [habit async for habit in queryset[: page_size + 1]]
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    if reverse:
+        page.reverse()
+    has_next = has_more if not reverse else position is not None
+    has_previous = has_more if reverse else position is not None
+    next_link = previous_link = None
+    if page and has_next:
+        next_link = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(page[-1].id)))
+    if page and has_previous:
+        previous_link = paginator.encode_cursor(Cursor(offset=0, reverse=True, position=str(page[0].id)))
+    return page, {"next": next_link, "previous": previous_link}
+
+
+class AsyncReadView(View):
+    """Основа асинхронных представлений чтения.
+
+    Аутентификация и права — те же, что у DRF (через Request), но синхронная
+    часть выполняется в sync_to_async, а выборка — асинхронным ORM, поэтому
+    ожидание БД и кэша не занимает воркер ASGI.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    public_feed = False
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        try:
+            await sync_to_async(self.check_permissions)(request)
+            return await self.respond(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def check_permissions(self, request):
+        for permission in (permission() for permission in self.permission_classes):
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, "message", None))
+
+    def handle_exception(self, request, exc):
+        response = self.render(exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail})
+        response.status_code = exc.status_code
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+            if header:
+                response["WWW-Authenticate"] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        return response
+
+    def render(self, data):
+        return HttpResponse(JSONRenderer().render(data), content_type="application/json")
+
+    def not_modified(self, request, etag):
+        if etag is not None and etag_matches(etag, request):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+        return None
+
+    def get_queryset(self, request):
+        expand = get_expand_fields(request, self.public_feed)
+        queryset = Habit.objects.all()
+        return queryset.select_related(*expand) if expand else queryset
+
+    async def list_page(self, request, queryset):
+        page, links = await paginate_by_id(queryset, request)
+        results = HabitSerializer(
+            page, many=True, context={"request": request, "public_feed": self.public_feed}
+        ).data
+        return {**links, "results": results}
+
+    async def respond(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class HabitListAsyncView(AsyncReadView):
+    """Асинхронный эндпоинт списка привычек пользователя"""
+
+    async def respond(self, request):
+        version = await sync_to_async(get_version)(user_habits_version_key(request.user.pk))
+        etag = make_etag(version, request)
+        response = self.not_modified(request, etag)
+        if response is None:
+            queryset = self.get_queryset(request).filter(user=request.user)
+            response = self.render(await self.list_page(request, queryset))
+            response["ETag"] = etag
+        return response
+
+
+class PublishedHabitListAsyncView(AsyncReadView):
+    """Асинхронный эндпоинт публичной ленты; делит кэш страниц с синхронным"""
+
+    permission_classes = (AllowAny,)
+    public_feed = True
+
+    async def respond(self, request):
+        version = await sync_to_async(get_version)(PUBLIC_FEED_VERSION_KEY)
+        key = public_feed_cache_key(request, version)
+        data = await sync_to_async(public_feed_cache.get)(key)
+        if data is None:
+            data = await self.list_page(request, self.get_queryset(request).filter(is_published=True))
+            await sync_to_async(public_feed_cache.set)(key, data)
+        return self.render(data)
+
+
+class HabitRetrieveAsyncView(AsyncReadView):
+    """Асинхронный эндпоинт просмотра привычки"""
+
+    async def respond(self, request, pk):
+        etag = None
+        # Версия владельца неизвестна без чтения строки, поэтому с ?expand=user 304 не отдаём
+        if "user" not in get_expand_fields(request):
+            version = await sync_to_async(get_version)(habit_version_key(pk))
+            etag = make_etag(version, request)
+            response = self.not_modified(request, etag)
+            if response is not None:
+                return response
+        try:
+            habit = await self.get_queryset(request).aget(pk=pk)
+        except Habit.DoesNotExist:
+            raise exceptions.NotFound()
+        response = self.render(HabitSerializer(habit, context={"request": request}).data)
+        if etag is not None:
+            response["ETag"] = etag
+        return response
@@ -0,0 +1,215 @@
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize_latencies(latencies):
+    """Сводка задержек в миллисекундах"""
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name, results, output_dir=None):
+    """Сохраняет результаты прогона в JSON, чтобы сравнивать их между коммитами"""
+
+    output_dir = Path(output_dir or settings.BASE_DIR / "benchmarks" / "results")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    commit = get_git_commit()
+    started_at = timezone.now()
+    path = output_dir / f"{name}-{started_at:%Y%m%d-%H%M%S}-{commit}.json"
+    payload = {
+        "name": name,
+        "commit": commit,
+        "created_at": started_at.isoformat(),
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2))
+    return path
+
+
+COMPARED_METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "queries_per_request")
+
+
+def compare_results(baseline, candidate):
+    """Изменение метрик прогона candidate относительно baseline по общим эндпоинтам, в процентах"""
+
+    comparison = {}
+    for name in baseline["results"].keys() & candidate["results"].keys():
+        before, after = baseline["results"][name], candidate["results"][name]
+        comparison[name] = {
+            metric: {
+                "before": before[metric],
+                "after": after[metric],
+                "change_pct": round((after[metric] - before[metric]) / before[metric] * 100, 1)
+                if before[metric] else None,
+            }
+            for metric in COMPARED_METRICS
+            if before.get(metric) is not None and after.get(metric) is not None
+        }
+    return dict(sorted(comparison.items()))
+
+
+# Что загружает процесс при старте: воркер gunicorn — приложение WSGI и URLconf (он грузится на первом
+# запросе), воркер celery — приложение, django.setup() и модули задач
+STARTUP_TARGETS = {
+    "config.wsgi": "import config.wsgi\nfrom django.urls import get_resolver\nget_resolver().url_patterns",
+    "config.celery": (
+        "from config.celery import app\nimport django\ndjango.setup()\napp.loader.import_default_modules()"
+    ),
+}
+# Тяжёлые модули, которые импортируются только при первом обращении и не должны грузиться при старте
+LAZY_MODULES = ("numpy", "pandas", "pyarrow", "drf_yasg.generators")
+
+STARTUP_SCRIPT = """import json, sys, time
+preloaded = list(sys.modules)
+started = time.perf_counter()
+{code}
+seconds = time.perf_counter() - started
+lazy_loaded = [name for name in {lazy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "lazy_loaded": lazy_loaded, "preloaded": preloaded}}))
+"""
+
+
+def measure_startup(target, importtime=False):
+    """Холодный импорт цели в отдельном интерпретаторе.
+
+    Возвращает время импорта, загруженные при старте ленивые модули и, с
+    importtime=True, строки -X importtime (с ним сам импорт заметно медленнее).
+    """
+
+    script = STARTUP_SCRIPT.format(code=STARTUP_TARGETS[target], lazy=LAZY_MODULES)
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", script]
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings")}
+    completed = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    # Модули самого интерпретатора (site, encodings) загружены до цели и в профиль не входят
+    preloaded = set(result.pop("preloaded"))
+    modules = parse_importtime(completed.stderr) if importtime else []
+    result["modules"] = [module for module in modules if module[0] not in preloaded]
+    return result
+
+
+def parse_importtime(output):
+    """Строки -X importtime: модуль, собственное и накопленное время в секундах, глубина вложенности"""
+
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return modules
+
+
+def summarize_imports(modules, top=20):
+    """Сводка импорта, мс: накопленное время модулей, импортированных напрямую, самые дорогие
+    модули по собственному времени и суммарное собственное время по пакетам верхнего уровня"""
+
+    packages = Counter()
+    for name, self_time, _, _ in modules:
+        packages[name.split(".")[0]] += self_time
+    slowest = sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+    top_level = sorted((module for module in modules if module[3] == 0), key=lambda module: module[2], reverse=True)
+    return {
+        "modules": len(modules),
+        "top_level_ms": {name: round(cumulative * 1000, 2) for name, _, cumulative, _ in top_level[:top]},
+        "slowest_modules_ms": {name: round(self_time * 1000, 2) for name, self_time, _, _ in slowest},
+        "packages_ms": {name: round(total * 1000, 2) for name, total in packages.most_common(top)},
+    }
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Ответ Bot API по chat_id: "bad" — 400, "blocked" — 403, "down" — 502,
+    "flaky" — 429 с retry_after на первый запрос, остальные — успех"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        chat_id = body.get("chat_id")
+        with self.server.lock:
+            self.server.received.append(body)
+            first = sum(item.get("chat_id") == chat_id for item in self.server.received) == 1
+        status, payload = 200, {"ok": True}
+        if chat_id == "bad":
+            status, payload = 400, {"ok": False, "description": "Bad Request: message text is empty"}
+        elif chat_id == "blocked":
+            status, payload = 403, {"ok": False, "description": "Forbidden: bot was blocked by the user"}
+        elif chat_id == "down":
+            status, payload = 502, {"ok": False, "description": "Bad Gateway"}
+        elif chat_id == "flaky" and first:
+            status, payload = 429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0}}
+        payload = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """Локальная заглушка Bot API для тестов и бенчмарков.
+
+    Используется как контекстный менеджер; адрес для TELEGRAM_URL_BOT — в base_url.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay=0):
+        super().__init__(("127.0.0.1", 0), FakeTelegramHandler)
+        self.delay = delay
+        self.received = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/bot"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+PUBLIC_FEED_VERSION_KEY = "habits:public_feed:version"
+
+
+def user_habits_version_key(user_id):
+    return f"habits:user:{user_id}:version"
+
+
+def habit_version_key(pk):
+    return f"habits:habit:{pk}:version"
+
+
+def get_version(key):
+    """Текущая версия набора данных; при отсутствии в кэше заводится новая"""
+
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Инвалидирует все записи, построенные на прежней версии"""
+
+    cache.set(key, uuid4().hex, None)
+
+
+def invalidate_user_habits(user_id, pks):
+    """Сброс версий после пакетных операций, которые не вызывают сигналы модели"""
+
+    bump_version(PUBLIC_FEED_VERSION_KEY)
+    bump_version(user_habits_version_key(user_id))
+    cache.delete_many([habit_version_key(pk) for pk in pks])
+
+
+def invalidate_habit_schedules(habits):
+    """Сброс версий после пакетного сдвига расписания (тик рассылки, пересчёт поясов) в обход сигналов.
+
+    Расписания нет в публичной ленте, поэтому её версия не меняется. Удалённая
+    версия при следующем чтении заводится заново, то есть тоже меняется.
+    """
+
+    keys = {user_habits_version_key(habit.user_id) for habit in habits}
+    keys.update(habit_version_key(habit.pk) for habit in habits)
+    cache.delete_many(list(keys))
+
+
+def incr_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+class LocalLRUCache:
+    """Ограниченный по размеру кэш в памяти процесса с вытеснением давно не читанных записей"""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TwoTierCache:
+    """Двухуровневый кэш: LRU процесса перед общим кэшем Django (Redis).
+
+    Счётчики попаданий и промахов хранятся в общем кэше, чтобы их можно было
+    смотреть сразу по всем воркерам.
+    """
+
+    STATS = ("local_hits", "shared_hits", "misses")
+
+    def __init__(self, prefix, max_size, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.local = LocalLRUCache(max_size, timeout)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            incr_counter(f"{self.prefix}:stats:local_hits")
+            return value
+        value = cache.get(f"{self.prefix}:{key}")
+        if value is not None:
+            incr_counter(f"{self.prefix}:stats:shared_hits")
+            self.local.set(key, value)
+            return value
+        incr_counter(f"{self.prefix}:stats:misses")
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        cache.set(f"{self.prefix}:{key}", value, self.timeout)
+
+    def stats(self):
+        values = cache.get_many([f"{self.prefix}:stats:{name}" for name in self.STATS])
+        return {name: values.get(f"{self.prefix}:stats:{name}", 0) for name in self.STATS}
+
+
+public_feed_cache = TwoTierCache(
+    "habits:public_feed",
+    max_size=settings.PUBLIC_FEED_LOCAL_CACHE_SIZE,
+    timeout=settings.PUBLIC_FEED_CACHE_TIMEOUT,
+)
@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion
+
+COUNTER_FIELDS = ("streak", "completed_periods", "first_completed_at", "last_completed_at")
+
+
+def complete_habit(habit_id, completed_at=None):
+    """Записывает выполнение привычки и инкрементально обновляет её счётчики.
+
+    Повторная отметка в том же периоде ничего не меняет. Отметка задним числом
+    учитывается в числе выполненных периодов, но серию не пересчитывает.
+    Возвращает (привычка, отметка, создана ли отметка).
+    """
+
+    completed_at = completed_at or timezone.now()
+    with transaction.atomic():
+        # Блокировка строки привычки упорядочивает конкурентные отметки одной привычки
+        habit = Habit.objects.select_related("user").select_for_update(of=("self",)).get(pk=habit_id)
+        period = habit.get_period_index(completed_at)
+        completion, created = HabitCompletion.objects.get_or_create(
+            habit=habit, period=period, defaults={"completed_at": completed_at}
+        )
+        if not created:
+            return habit, completion, False
+
+        last_period = habit.get_period_index(habit.last_completed_at) if habit.last_completed_at else None
+        if last_period is None or period > last_period:
+            habit.streak = habit.streak + 1 if last_period == period - 1 else 1
+            habit.last_completed_at = completed_at
+        if habit.first_completed_at is None or completed_at < habit.first_completed_at:
+            habit.first_completed_at = completed_at
+        habit.completed_periods += 1
+        habit.save(update_fields=COUNTER_FIELDS)
+    return habit, completion, True
+
+
+def renumber_completions(habit_ids):
+    """Пересчитывает номера периодов отметок и счётчики после переноса расписания.
+
+    Периоды начинаются в дни напоминаний, поэтому смена времени, периодичности
+    или часового пояса сдвигает их границы. Отметки, оказавшиеся в одном
+    периоде, сливаются в самую раннюю. Возвращает привычки, счётчики которых изменились.
+    """
+
+    changed = []
+    with transaction.atomic():
+        habits = (
+            Habit.objects.select_related("user")
+            .select_for_update(of=("self",))
+            .filter(pk__in=HabitCompletion.objects.filter(habit_id__in=habit_ids).values("habit_id"))
+        )
+        for habit in habits:
+            completions = list(habit.completions.order_by("completed_at"))
+            by_period = {}
+            for completion in completions:
+                by_period.setdefault(habit.get_period_index(completion.completed_at), completion)
+            if all(by_period.get(completion.period) is completion for completion in completions):
+                continue
+            periods = sorted(by_period)
+            streak = 0
+            for period in reversed(periods):
+                if period != periods[-1] - streak:
+                    break
+                streak += 1
+            habit.completions.all().delete()
+            HabitCompletion.objects.bulk_create(
+                HabitCompletion(habit=habit, period=period, completed_at=completion.completed_at)
+                for period, completion in by_period.items()
+            )
+            habit.streak = streak
+            habit.completed_periods = len(periods)
+            habit.first_completed_at = by_period[periods[0]].completed_at
+            habit.last_completed_at = by_period[periods[-1]].completed_at
+            habit.save(update_fields=COUNTER_FIELDS)
+            changed.append(habit)
+    return changed
@@ -0,0 +1,115 @@
+import csv
+import json
+from functools import lru_cache
+from importlib.util import find_spec
+from itertools import islice
+
+from habits.models import Habit
+
+EXPORT_FIELDS = (
+    "id",
+    "user_id",
+    "place",
+    "time",
+    "action",
+    "pleasant_habit",
+    "related_habit_id",
+    "periodicity",
+    "reward",
+    "time_to_complete",
+    "is_published",
+    "next_fire_at",
+)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def get_export_queryset(user):
+    """Сотрудники выгружают все привычки, остальные пользователи — только свои"""
+
+    queryset = Habit.objects.all()
+    return queryset if user.is_staff else queryset.filter(user=user)
+
+
+def iter_habit_rows(queryset, chunk_size=2000):
+    """Строки привычек через серверный курсор: память не зависит от размера выгрузки"""
+
+    return queryset.order_by("id").values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """Псевдофайл для csv.writer, который возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, default=str) + "\n"
+
+
+@lru_cache(maxsize=None)
+def parquet_available():
+    """Установлены ли pyarrow и pandas; сами модули не импортируются, чтобы не замедлять старт"""
+
+    return find_spec("pyarrow") is not None and find_spec("pandas") is not None
+
+
+def write_parquet(rows, path, chunk_size=50000):
+    """Запись Parquet группами строк; для записи нужен pyarrow (необязательная зависимость)"""
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Для выгрузки в Parquet установите pyarrow")
+    import pandas as pd
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("place", pa.string()),
+            ("time", pa.time64("us")),
+            ("action", pa.string()),
+            ("pleasant_habit", pa.bool_()),
+            ("related_habit_id", pa.int64()),
+            ("periodicity", pa.int16()),
+            ("reward", pa.string()),
+            ("time_to_complete", pa.int32()),
+            ("is_published", pa.bool_()),
+            ("next_fire_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+    rows = iter(rows)
+    with pq.ParquetWriter(path, schema) as writer:
+        while chunk := list(islice(rows, chunk_size)):
+            frame = pd.DataFrame.from_records(chunk, columns=EXPORT_FIELDS)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+def write_export(rows, file_format, path):
+    """Запись выгрузки в файл любого из поддерживаемых форматов"""
+
+    if file_format == "parquet":
+        write_parquet(rows, path)
+        return
+    lines = iter_csv(rows) if file_format == "csv" else iter_jsonl(rows)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.writelines(lines)
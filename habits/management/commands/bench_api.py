@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from habits.benchmarks import save_results, summarize_latencies
+from habits.management.commands.seed_habits import BENCHMARK_PASSWORD
+from habits.models import Habit
+
+
+def get_rss_mb(pids):
+    """Суммарная резидентная память процессов сервера по /proc, МБ"""
+
+    total_kb = 0
+    for pid in pids:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                total_kb += int(line.split()[1])
+    return round(total_kb / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный прогон эндпоинтов привычек и пользователей: задержки, запросы к БД, пропускная способность"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Запросов на эндпоинт")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--output", default=None, help="Каталог для JSON с результатами")
+        parser.add_argument(
+            "--base-url",
+            default=None,
+            help="Адрес запущенного сервера (http://localhost:8080): прогон по HTTP вместо тестового клиента",
+        )
+        parser.add_argument("--label", default=None, help="Метка прогона в имени файла, например wsgi или asgi")
+        parser.add_argument(
+            "--server-pids",
+            type=int,
+            nargs="*",
+            default=(),
+            help="PID процессов сервера, чья память (RSS) попадёт в результаты",
+        )
+
+    def handle(self, *args, **options):
+        habit = (
+            Habit.objects.filter(user__email__startswith="bench-")
+            .select_related("user")
+            .first()
+        )
+        if habit is None:
+            raise CommandError("Нет данных для прогона, сначала выполните seed_habits")
+        user = habit.user
+        token = f"Bearer {AccessToken.for_user(user)}"
+        endpoints = {
+            "habits-list": ("get", "/habits/", {}),
+            "habits-list-expand": ("get", "/habits/", {"expand": "related_habit,user"}),
+            "public-habits": ("get", "/habits/public/list/", {}),
+            "habit-detail": ("get", f"/habits/{habit.pk}/", {}),
+            "user-detail": ("get", f"/users/{user.pk}/", {}),
+            "login": ("post", "/users/login/", {"email": user.email, "password": BENCHMARK_PASSWORD}),
+        }
+
+        results = {}
+        for name, endpoint in endpoints.items():
+            results[name] = self.run_endpoint(endpoint, token, options)
+            self.stdout.write(f"{name}: {results[name]}")
+
+        if options["server_pids"]:
+            results["server"] = {"rss_mb": get_rss_mb(options["server_pids"])}
+            self.stdout.write(f"server: {results['server']}")
+
+        name = f"api-{options['label']}" if options["label"] else "api"
+        path = save_results(name, results, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {path}"))
+
+    def run_endpoint(self, endpoint, token, options):
+        method, url, data = endpoint
+        base_url = options["base_url"].rstrip("/") if options["base_url"] else None
+
+        def http_worker(count):
+            # По HTTP запросы к БД на стороне сервера не видны, считаются только задержки
+            session = requests.Session()
+            session.headers["Authorization"] = token
+            samples = []
+            for _ in range(count):
+                started = time.perf_counter()
+                if method == "get":
+                    response = session.get(base_url + url, params=data)
+                else:
+                    response = session.post(base_url + url, data=data)
+                samples.append((time.perf_counter() - started, None, response.status_code < 400))
+            return samples
+
+        def worker(count):
+            if base_url:
+                return http_worker(count)
+            client = Client(HTTP_AUTHORIZATION=token)
+            samples = []
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    elapsed = time.perf_counter() - started
+                samples.append((elapsed, len(queries), response.status_code < 400))
+            return samples
+
+        def threaded_worker(count):
+            try:
+                return worker(count)
+            finally:
+                connection.close()
+
+        concurrency = options["concurrency"]
+        per_worker = [options["requests"] // concurrency] * concurrency
+        per_worker[0] += options["requests"] % concurrency
+        started = time.perf_counter()
+        if concurrency == 1:
+            samples = worker(per_worker[0])
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = [
+                    sample
+                    for chunk in executor.map(threaded_worker, per_worker)
+                    for sample in chunk
+                ]
+        duration = time.perf_counter() - started
+
+        return {
+            "requests": len(samples),
+            "errors": sum(not ok for _, _, ok in samples),
+            "throughput_rps": round(len(samples) / duration, 2),
+            "queries_per_request": None if base_url else round(sum(q for _, q, _ in samples) / len(samples), 2),
+            **summarize_latencies([elapsed for elapsed, _, _ in samples]),
+        }
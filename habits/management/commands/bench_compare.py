@@ -0,0 +1,24 @@
+import json
+from pathlib import Path
+
+from django.core.management import BaseCommand
+
+from habits.benchmarks import compare_results
+
+
+class Command(BaseCommand):
+    help = "Сравнение двух сохранённых прогонов бенчмарка, например bench_api под WSGI и под ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline", help="JSON с результатами базового прогона")
+        parser.add_argument("candidate", help="JSON с результатами сравниваемого прогона")
+
+    def handle(self, *args, **options):
+        baseline = json.loads(Path(options["baseline"]).read_text())
+        candidate = json.loads(Path(options["candidate"]).read_text())
+        self.stdout.write(f"{baseline['name']} ({baseline['commit']}) -> {candidate['name']} ({candidate['commit']})")
+        for name, metrics in compare_results(baseline, candidate).items():
+            self.stdout.write(name)
+            for metric, values in metrics.items():
+                change = "n/a" if values["change_pct"] is None else f"{values['change_pct']:+.1f}%"
+                self.stdout.write(f"  {metric}: {values['before']} -> {values['after']} ({change})")
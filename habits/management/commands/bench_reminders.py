@@ -0,0 +1,57 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from config.celery import app
+from habits.benchmarks import FakeTelegramServer, save_results
+from habits.models import Habit, ReminderDelivery
+from habits.tasks import telegram_notification
+
+
+class Command(BaseCommand):
+    help = "Прогон тика рассылки напоминаний против локальной заглушки Telegram (только для тестовой БД)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=1000, help="Сколько привычек сделать наступившими")
+        parser.add_argument("--telegram-delay", type=float, default=0.05, help="Задержка ответа заглушки, с")
+        parser.add_argument("--output", default=None, help="Каталог для JSON с результатами")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        due_ids = list(
+            Habit.objects.filter(user__email__startswith="bench-")
+            .order_by("id")
+            .values_list("id", flat=True)[: options["habits"]]
+        )
+        Habit.objects.filter(pk__in=due_ids).update(next_fire_at=now)
+
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        try:
+            with FakeTelegramServer(delay=options["telegram_delay"]) as server:
+                with override_settings(TELEGRAM_URL_BOT=server.base_url, TG_BOT_TOKEN="benchmark"):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        telegram_notification()
+                        duration = time.perf_counter() - started
+                messages = len(server.received)
+        finally:
+            app.conf.task_always_eager = always_eager
+
+        results = {
+            "due_habits": len(due_ids),
+            "messages": messages,
+            "sent": ReminderDelivery.objects.filter(
+                habit_id__in=due_ids, scheduled_at=now, status=ReminderDelivery.SENT
+            ).count(),
+            "tick_seconds": round(duration, 3),
+            "messages_per_second": round(messages / duration, 2) if duration else None,
+            "queries": len(queries),
+            "telegram_delay": options["telegram_delay"],
+        }
+        self.stdout.write(str(results))
+        path = save_results("reminders", results, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {path}"))
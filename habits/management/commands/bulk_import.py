@@ -0,0 +1,207 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from habits.cache import invalidate_user_habits
+from habits.models import Habit, ImportCheckpoint
+from habits.scheduler import schedule_feed
+from habits.serializers import HabitBulkSerializer
+from habits.services import get_schedule
+from users.models import User
+from users.serializers import UserSerializer
+
+
+class UserImportSerializer(UserSerializer):
+    """Проверка строки пользователя; уникальность email проверяется сразу для всей порции"""
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {"email": {"validators": []}}
+
+
+def read_rows(path, file_format):
+    """Построчное чтение CSV или JSONL без загрузки файла в память"""
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if value != ""}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def allocate_pks(model, count):
+    """Первичные ключи из последовательности таблицы: COPY, в отличие от bulk_create, их не возвращает"""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_objects(model, objs):
+    """Загрузка объектов в PostgreSQL через COPY FROM STDIN; объекты получают первичные ключи"""
+
+    for obj, pk in zip(objs, allocate_pks(model, len(objs))):
+        obj.pk = pk
+        obj._state.adding = False
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        row = []
+        for field in fields:
+            value = field.get_db_prep_save(getattr(obj, field.attname), connection)
+            row.append("\\N" if value is None else value)
+        writer.writerow(row)
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+class Command(BaseCommand):
+    help = "Потоковый импорт пользователей или привычек из CSV/JSONL большими пакетами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=("users", "habits"))
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Имя контрольной точки в БД (по умолчанию <model>:<абсолютный путь к файлу>)",
+        )
+        parser.add_argument("--resume", action="store_true", help="Продолжить с контрольной точки")
+        parser.add_argument("--no-copy", action="store_true", help="Не использовать COPY даже на PostgreSQL")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден")
+        file_format = options["format"] or ("csv" if path.suffix == ".csv" else "jsonl")
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            name=options["checkpoint"] or f"{options['model']}:{path.resolve()}"
+        )
+        skip = checkpoint.processed if options["resume"] else 0
+        self.use_copy = connection.vendor == "postgresql" and not options["no_copy"]
+        prepare = self.prepare_users if options["model"] == "users" else self.prepare_habits
+
+        rows = islice(read_rows(path, file_format), skip, None)
+        processed, loaded, failed = skip, 0, 0
+        while batch := list(islice(rows, options["batch_size"])):
+            objs, errors = prepare(batch, first_line=processed + 1)
+            processed += len(batch)
+            # Контрольная точка пишется в одной транзакции с пакетом: после сбоя пакет не повторится
+            with transaction.atomic():
+                self.write(objs)
+                checkpoint.processed = processed
+                checkpoint.save(update_fields=["processed", "updated_at"])
+            if options["model"] == "habits":
+                self.announce(objs)
+            loaded += len(objs)
+            failed += len(errors)
+            for line, error in errors:
+                self.stderr.write(f"Строка {line}: {error}")
+            self.stdout.write(f"Обработано строк: {processed}, загружено: {loaded}, с ошибками: {failed}")
+
+        self.stdout.write(self.style.SUCCESS(f"Импорт завершён: загружено {loaded}, с ошибками {failed}"))
+
+    def write(self, objs):
+        if not objs:
+            return
+        model = type(objs[0])
+        if self.use_copy:
+            copy_objects(model, objs)
+        else:
+            model.objects.bulk_create(objs, batch_size=1000)
+
+    def announce(self, habits):
+        """Сброс версий кэша владельцев и сообщение планировщику: COPY и bulk_create обходят сигналы"""
+
+        by_user = defaultdict(list)
+        for habit in habits:
+            by_user[habit.user_id].append(habit.pk)
+        for user_id, pks in by_user.items():
+            invalidate_user_habits(user_id, pks)
+        schedule_feed.publish([(habit.pk, habit.next_fire_at) for habit in habits])
+
+    def prepare_users(self, batch, first_line):
+        """Пользователи пакета.
+
+        Готовый хэш из колонки password_hash переносится как есть, без пароля
+        ставится неиспользуемый. Пароль открытым текстом (колонка password)
+        хэшируется PBKDF2 — это сотни миллисекунд на строку, поэтому большие
+        выгрузки лучше передавать с хэшами.
+        """
+
+        emails = {row.get("email") for row in batch}
+        taken = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+        objs, errors = [], []
+        for line, row in enumerate(batch, first_line):
+            password = row.pop("password", None)
+            password_hash = row.pop("password_hash", None)
+            if password_hash is not None:
+                try:
+                    identify_hasher(password_hash)
+                except ValueError:
+                    errors.append((line, {"password_hash": ["Неизвестный формат хэша пароля."]}))
+                    continue
+            serializer = UserImportSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append((line, serializer.errors))
+                continue
+            email = serializer.validated_data["email"]
+            if email in taken:
+                errors.append((line, {"email": ["Пользователь с таким Email уже существует."]}))
+                continue
+            taken.add(email)
+            user = User(**serializer.validated_data)
+            if password_hash is not None:
+                user.password = password_hash
+            elif password:
+                user.set_password(password)
+            else:
+                user.set_unusable_password()
+            objs.append(user)
+        return objs, errors
+
+    def prepare_habits(self, batch, first_line):
+        users = User.objects.in_bulk({row.get("user") for row in batch if row.get("user")})
+        related_habits = Habit.objects.in_bulk(
+            {row.get("related_habit") for row in batch if row.get("related_habit")}
+        )
+        context = {"related_habits": related_habits}
+        objs, errors = [], []
+        for line, row in enumerate(batch, first_line):
+            user_id = str(row.pop("user", ""))
+            user = users.get(int(user_id)) if user_id.isdigit() else None
+            if user is None:
+                errors.append((line, {"user": ["Пользователь не найден."]}))
+                continue
+            serializer = HabitBulkSerializer(data=row, context=context)
+            if not serializer.is_valid():
+                errors.append((line, serializer.errors))
+                continue
+            attrs = serializer.validated_data
+            related_habit = attrs.get("related_habit")
+            if related_habit and related_habit.user_id != user.pk:
+                errors.append((line, {"related_habit": ["Связанная привычка принадлежит другому пользователю."]}))
+                continue
+            objs.append(Habit(**attrs, user=user, **get_schedule(attrs["time"], user.zoneinfo)))
+        return objs, errors
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from config.openapi import get_code_version, render_schema, write_schema_files
+
+
+class Command(BaseCommand):
+    help = "Генерация схемы API в статические JSON и YAML (их отдаёт nginx и кэшированные представления схемы)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="Каталог для файлов схемы, по умолчанию OPENAPI_SCHEMA_DIR")
+
+    def handle(self, *args, **options):
+        directory = write_schema_files(render_schema(), options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Схема API версии {get_code_version()} сохранена в {directory}"))
@@ -0,0 +1,44 @@
+from django.core.management import BaseCommand, CommandError
+
+from habits.benchmarks import STARTUP_TARGETS, measure_startup, save_results, summarize_imports
+
+
+class Command(BaseCommand):
+    help = "Профиль холодного старта веб- и celery-процессов: время импорта по модулям (python -X importtime)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="*", help=f"Цели: {', '.join(STARTUP_TARGETS)} (по умолчанию все)")
+        parser.add_argument("--top", type=int, default=20, help="Сколько самых дорогих модулей и пакетов показать")
+        parser.add_argument("--output", default=None, help="Каталог для JSON с результатами")
+
+    def handle(self, *args, **options):
+        unknown = set(options["targets"]) - set(STARTUP_TARGETS)
+        if unknown:
+            raise CommandError(f"Неизвестные цели: {', '.join(sorted(unknown))}")
+        results = {}
+        for target in options["targets"] or STARTUP_TARGETS:
+            # Время без -X importtime: профилирование само замедляет импорт
+            measured = measure_startup(target)
+            profile = measure_startup(target, importtime=True)
+            results[target] = {
+                "seconds": round(measured["seconds"], 4),
+                "lazy_loaded": measured["lazy_loaded"],
+                **summarize_imports(profile["modules"], options["top"]),
+            }
+            self.write_report(target, results[target])
+
+        path = save_results("startup", results, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {path}"))
+
+    def write_report(self, target, result):
+        self.stdout.write(f"{target}: {result['seconds'] * 1000:.1f} мс, модулей: {result['modules']}")
+        if result["lazy_loaded"]:
+            self.stdout.write(self.style.WARNING(f"  при старте загружены ленивые модули: {result['lazy_loaded']}"))
+        for title, key in (
+            ("Импортированы напрямую (накопленно)", "top_level_ms"),
+            ("Самые дорогие модули (собственное время)", "slowest_modules_ms"),
+            ("Пакеты (собственное время)", "packages_ms"),
+        ):
+            self.stdout.write(f"  {title}:")
+            for name, milliseconds in result[key].items():
+                self.stdout.write(f"    {milliseconds:>9.2f} мс  {name}")
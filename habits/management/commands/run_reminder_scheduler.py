@@ -0,0 +1,46 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from habits.scheduler import ReminderScheduler
+from habits.tasks import dispatch_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Долгоживущий планировщик: отправляет напоминания в момент наступления, а не раз в тик beat"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=settings.REMINDER_SCHEDULER_HORIZON,
+            help="На сколько секунд вперёд держать наступления в памяти",
+        )
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            default=settings.REMINDER_SCHEDULER_MAX_ENTRIES,
+            help="Предел числа наступлений в памяти",
+        )
+        parser.add_argument(
+            "--refresh",
+            type=int,
+            default=settings.REMINDER_SCHEDULER_REFRESH,
+            help="Раз в сколько секунд перечитывать окно из БД",
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            dispatch=dispatch_due_reminders,
+            horizon=options["horizon"],
+            max_entries=options["max_entries"],
+            refresh_interval=options["refresh"],
+        )
+        self.stdout.write(
+            f"Планировщик запущен: окно {options['horizon']} с, до {options['max_entries']} наступлений"
+        )
+        try:
+            asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            self.stdout.write("Планировщик остановлен")
@@ -0,0 +1,70 @@
+import random
+from datetime import time
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from habits.models import Habit
+from habits.services import get_schedule
+from users.models import User
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = "Генерирует синтетических пользователей и привычки пакетными вставками (только для тестовой БД)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--habits-per-user", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--published-ratio", type=float, default=0.3)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        habits_per_user = options["habits_per_user"]
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы часы
+        password = make_password(BENCHMARK_PASSWORD)
+        run = uuid4().hex[:8]
+        now = timezone.now()
+
+        created_users = created_habits = 0
+        for start in range(0, options["users"], batch_size):
+            stop = min(start + batch_size, options["users"])
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        email=f"bench-{run}-{index}@example.com",
+                        password=password,
+                        tg_chat_id=str(1_000_000 + index),
+                    )
+                    for index in range(start, stop)
+                ]
+            )
+            habits = []
+            for user in users:
+                for _ in range(habits_per_user):
+                    minute = rng.randrange(24 * 60)
+                    habit_time = time(minute // 60, minute % 60)
+                    habits.append(
+                        Habit(
+                            user=user,
+                            place="benchmark",
+                            time=habit_time,
+                            action="benchmark action",
+                            time_to_complete=rng.randint(10, 120),
+                            periodicity=rng.randint(1, 7),
+                            is_published=rng.random() < options["published_ratio"],
+                            **get_schedule(habit_time, after=now),
+                        )
+                    )
+            Habit.objects.bulk_create(habits, batch_size=batch_size)
+            created_users += len(users)
+            created_habits += len(habits)
+            self.stdout.write(f"Пользователей: {created_users}, привычек: {created_habits}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово, метка прогона: bench-{run}"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 13:33
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_next_fire_at(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    now = timezone.now()
+    today = timezone.localtime(now).date()
+    batch = []
+    for habit in Habit.objects.only("id", "time").iterator(chunk_size=2000):
+        fire_at = timezone.make_aware(datetime.combine(today, habit.time))
+        if fire_at < now:
+            fire_at += timedelta(days=1)
+        habit.next_fire_at = fire_at
+        batch.append(habit)
+        if len(batch) >= 2000:
+            Habit.objects.bulk_update(batch, ["next_fire_at"])
+            batch = []
+    Habit.objects.bulk_update(batch, ["next_fire_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="next_fire_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text="Момент ближайшей отправки напоминания с учётом периодичности",
+                null=True,
+                verbose_name="Следующее напоминание",
+            ),
+        ),
+        migrations.RunPython(fill_next_fire_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_habit_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderTick",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(db_index=True, verbose_name="Начало"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Окончание"
+                    ),
+                ),
+                (
+                    "duration",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Длительность, с"
+                    ),
+                ),
+                (
+                    "habits_scanned",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Привычек наступило"
+                    ),
+                ),
+                (
+                    "attempted",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Попыток отправки"
+                    ),
+                ),
+                (
+                    "sent",
+                    models.PositiveIntegerField(default=0, verbose_name="Отправлено"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="Ошибок"),
+                ),
+                (
+                    "latency_p50",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Telegram p50, с"
+                    ),
+                ),
+                (
+                    "latency_p95",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Telegram p95, с"
+                    ),
+                ),
+                (
+                    "latency_max",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Telegram max, с"
+                    ),
+                ),
+                (
+                    "lag_p50",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Опоздание p50, с"
+                    ),
+                ),
+                (
+                    "lag_p95",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Опоздание p95, с"
+                    ),
+                ),
+                (
+                    "lag_max",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Опоздание max, с"
+                    ),
+                ),
+                (
+                    "latency_histogram",
+                    models.JSONField(
+                        default=dict, verbose_name="Гистограмма задержек Telegram"
+                    ),
+                ),
+                (
+                    "lag_histogram",
+                    models.JSONField(
+                        default=dict, verbose_name="Гистограмма опозданий"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Тик рассылки",
+                "verbose_name_plural": "Тики рассылки",
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 13:45
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_reminder_load(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    ReminderLoadBucket = apps.get_model("habits", "ReminderLoadBucket")
+    grouped = (
+        Habit.objects.annotate(minute=ExtractHour("time") * 60 + ExtractMinute("time"))
+        .values("minute", "periodicity")
+        .annotate(count=Count("id"))
+        .values_list("minute", "periodicity", "count")
+    )
+    ReminderLoadBucket.objects.bulk_create(
+        [
+            ReminderLoadBucket(minute=minute, periodicity=periodicity, count=count)
+            for minute, periodicity, count in grouped
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_habitexport"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderLoadBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "minute",
+                    models.PositiveSmallIntegerField(verbose_name="Минута суток"),
+                ),
+                (
+                    "periodicity",
+                    models.PositiveSmallIntegerField(verbose_name="Периодичность"),
+                ),
+                ("count", models.IntegerField(default=0, verbose_name="Привычек")),
+            ],
+            options={
+                "verbose_name": "Нагрузка напоминаний",
+                "verbose_name_plural": "Нагрузка напоминаний",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("minute", "periodicity"),
+                        name="unique_reminder_load_bucket",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_reminder_load, migrations.RunPython.noop),
+    ]
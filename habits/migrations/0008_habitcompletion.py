@@ -0,0 +1,91 @@
+# Generated by Django 5.2 on 2026-10-18 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_brin_index(apps, schema_editor):
+    # BRIN занимает единицы страниц и почти не замедляет вставку; есть только в PostgreSQL
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX habit_completion_brin ON habits_habitcompletion USING brin (completed_at)"
+        )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS habit_completion_brin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0007_reminderloadbucket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="completed_periods",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Выполнено периодов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="first_completed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Первое выполнение"
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="last_completed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Последнее выполнение"
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="streak",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Серия периодов подряд"
+            ),
+        ),
+        migrations.CreateModel(
+            name="HabitCompletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.PositiveIntegerField(verbose_name="Номер периода")),
+                ("completed_at", models.DateTimeField(verbose_name="Выполнено")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выполнение привычки",
+                "verbose_name_plural": "Выполнения привычек",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "period"), name="unique_habit_period"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
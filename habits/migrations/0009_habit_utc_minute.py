@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 13:49
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_utc_minute(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    Habit.objects.filter(next_fire_at__isnull=False).update(
+        utc_minute=ExtractHour("next_fire_at", tzinfo=timezone.utc) * 60
+        + ExtractMinute("next_fire_at", tzinfo=timezone.utc)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_habitcompletion"),
+        ("users", "0002_user_timezone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="utc_minute",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                db_index=True,
+                help_text="Минута суток ближайшего напоминания по UTC с учётом часового пояса владельца",
+                null=True,
+                verbose_name="Минута напоминания по UTC",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="reminderloadbucket",
+            name="minute",
+            field=models.PositiveSmallIntegerField(verbose_name="Минута суток по UTC"),
+        ),
+        migrations.RunPython(fill_utc_minute, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0009_habit_utc_minute"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TelegramDeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "chat_id",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Chat-ID Telegram"
+                    ),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="Код ответа"
+                    ),
+                ),
+                (
+                    "error",
+                    models.CharField(
+                        blank=True, default="", max_length=200, verbose_name="Ошибка"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создано"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Последняя ошибка"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Недоставляемый чат",
+                "verbose_name_plural": "Недоставляемые чаты",
+            },
+        ),
+        migrations.AddField(
+            model_name="reminderdelivery",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Попыток отправки"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from zoneinfo import ZoneInfo
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def get_period_index(moment, periodicity, tz, anchor):
+    """Расчёт номера периода на момент создания миграции, чтобы её результат не зависел от правок сервисов"""
+
+    step = periodicity or 1
+    offset = anchor.toordinal() % step if anchor else 0
+    return (timezone.localtime(moment, tz).date().toordinal() - offset) // step
+
+
+def recompute_completion_periods(apps, schema_editor):
+    """Пересчёт номеров периодов и счётчиков по местному времени владельца и дням напоминаний"""
+
+    Habit = apps.get_model("habits", "Habit")
+    HabitCompletion = apps.get_model("habits", "HabitCompletion")
+    habits = Habit.objects.filter(completions__isnull=False).distinct().select_related("user")
+    for habit in habits.iterator():
+        tz = ZoneInfo(habit.user.timezone) if habit.user else timezone.get_default_timezone()
+        anchor = timezone.localtime(habit.next_fire_at, tz).date() if habit.next_fire_at else None
+        by_period = {}
+        for completion in HabitCompletion.objects.filter(habit=habit).order_by("completed_at"):
+            period = get_period_index(completion.completed_at, habit.periodicity, tz, anchor)
+            # Отметки, попавшие в один период, сливаются в первую
+            by_period.setdefault(period, completion)
+        periods = sorted(by_period)
+        streak = 0
+        for period in reversed(periods):
+            if period != periods[-1] - streak:
+                break
+            streak += 1
+        HabitCompletion.objects.filter(habit=habit).delete()
+        HabitCompletion.objects.bulk_create(
+            HabitCompletion(habit=habit, period=period, completed_at=completion.completed_at)
+            for period, completion in by_period.items()
+        )
+        habit.streak = streak
+        habit.completed_periods = len(periods)
+        habit.first_completed_at = by_period[periods[0]].completed_at
+        habit.last_completed_at = by_period[periods[-1]].completed_at
+        habit.save(update_fields=["streak", "completed_periods", "first_completed_at", "last_completed_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0011_importcheckpoint"),
+        ("users", "0002_user_timezone"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_completion_periods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0012_recompute_completion_periods"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminderdelivery",
+            name="claimed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Взято в работу"
+            ),
+        ),
+    ]
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Avg, F, Max, Q
+from django.utils import timezone
 
+from habits.services import get_period_index, get_schedule, get_user_timezone
 from users.models import User
 
 NULLABLE = {"blank": True, "null": True}
@@ -7,7 +11,11 @@ NULLABLE = {"blank": True, "null": True}
 
 class Habit(models.Model):
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="users", **NULLABLE
+        User,
+        on_delete=models.CASCADE,
+        related_name="users",
+        db_index=False,  # Покрывается составным индексом habit_user_id_idx
+        **NULLABLE,
     )
     place = models.CharField(
         max_length=99,
@@ -47,6 +55,316 @@ class Habit(models.Model):
         help_text="Укажите время выполнения",
     )
     is_published = models.BooleanField(default=True, verbose_name="Признак публичности")
+    next_fire_at = models.DateTimeField(
+        db_index=True,
+        verbose_name="Следующее напоминание",
+        help_text="Момент ближайшей отправки напоминания с учётом периодичности",
+        **NULLABLE,
+    )
+    utc_minute = models.PositiveSmallIntegerField(
+        db_index=True,
+        verbose_name="Минута напоминания по UTC",
+        help_text="Минута суток ближайшего напоминания по UTC с учётом часового пояса владельца",
+        **NULLABLE,
+    )
+    # Счётчики выполнения обновляются при записи отметки и не требуют обхода истории
+    streak = models.PositiveIntegerField(default=0, verbose_name="Серия периодов подряд")
+    completed_periods = models.PositiveIntegerField(default=0, verbose_name="Выполнено периодов")
+    first_completed_at = models.DateTimeField(verbose_name="Первое выполнение", **NULLABLE)
+    last_completed_at = models.DateTimeField(verbose_name="Последнее выполнение", **NULLABLE)
+
+    class Meta:
+        indexes = [
+            # Список привычек пользователя с пагинацией по курсору: WHERE user_id = ? ORDER BY id
+            models.Index(fields=["user", "id"], name="habit_user_id_idx"),
+            # Публичная лента: частичный индекс только по опубликованным привычкам
+            models.Index(
+                fields=["id"], condition=Q(is_published=True), name="habit_published_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.action} - {self.place}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Значения на момент загрузки нужны сигналам, чтобы понять, что изменилось
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def schedule(self, after=None):
+        """Пересчитывает ближайшее напоминание по местному времени владельца"""
+
+        for field, value in get_schedule(self.time, get_user_timezone(self.user), after).items():
+            setattr(self, field, value)
+
+    def get_period_index(self, moment):
+        """Номер периода выполнения по местному времени владельца; периоды начинаются в дни напоминаний.
+
+        Следующее напоминание сдвигается ровно на periodicity местных дней,
+        поэтому его дата задаёт одни и те же границы, пока расписание не изменят;
+        при переносе расписания отметки перенумеровывает renumber_completions.
+        """
+
+        tz = get_user_timezone(self.user)
+        anchor = timezone.localtime(self.next_fire_at, tz).date() if self.next_fire_at else None
+        return get_period_index(moment, self.periodicity, tz, anchor)
+
+    def get_current_streak(self, now=None):
+        """Серия на текущий момент: обнуляется, если пропущен целый период"""
+
+        if self.last_completed_at is None:
+            return 0
+        current = self.get_period_index(now or timezone.now())
+        if self.get_period_index(self.last_completed_at) < current - 1:
+            return 0
+        return self.streak
+
+    def get_completion_rate(self, now=None):
+        """Доля выполненных периодов с первого выполнения по текущий"""
+
+        if self.first_completed_at is None:
+            return None
+        current = self.get_period_index(now or timezone.now())
+        tracked = current - self.get_period_index(self.first_completed_at) + 1
+        return min(self.completed_periods / max(tracked, 1), 1.0)
+
+
+class HabitCompletion(models.Model):
+    """Отметка о выполнении привычки: не больше одной на период.
+
+    Строки компактные и пишутся только вставкой; уникальный индекс (habit, period)
+    упорядочен по времени и обслуживает историю привычки, а на PostgreSQL
+    completed_at дополнительно покрыт BRIN-индексом для выборок по диапазону дат.
+    """
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name="completions",
+        db_index=False,  # Покрывается уникальным индексом unique_habit_period
+        verbose_name="Привычка",
+    )
+    period = models.PositiveIntegerField(verbose_name="Номер периода")
+    completed_at = models.DateTimeField(verbose_name="Выполнено")
+
+    class Meta:
+        verbose_name = "Выполнение привычки"
+        verbose_name_plural = "Выполнения привычек"
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "period"], name="unique_habit_period"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit_id} - {self.completed_at}"
+
+
+class ReminderDeliveryQuerySet(models.QuerySet):
+
+    def pending(self):
+        return self.filter(status=ReminderDelivery.PENDING)
+
+    def backlog(self):
+        """Число неотправленных напоминаний, время которых уже наступило"""
+
+        return self.pending().filter(scheduled_at__lte=timezone.now()).count()
+
+    def stale_sending(self, now):
+        """Записи, взятые в работу дольше REMINDER_SENDING_TIMEOUT назад: воркер, скорее всего, упал"""
+
+        return self.filter(status=ReminderDelivery.SENDING).filter(
+            Q(claimed_at__lt=now - settings.REMINDER_SENDING_TIMEOUT) | Q(claimed_at__isnull=True)
+        )
+
+    def send_latency(self, since):
+        """Средняя и максимальная задержка отправки напоминаний, запланированных начиная с since"""
+
+        return self.filter(status=ReminderDelivery.SENT, scheduled_at__gte=since).aggregate(
+            avg=Avg(F("sent_at") - F("scheduled_at")),
+            max=Max(F("sent_at") - F("scheduled_at")),
+        )
+
+
+class ReminderDelivery(models.Model):
+    """Журнал отправки напоминаний: одна запись на каждое наступление привычки"""
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Ожидает отправки"),
+        (SENDING, "Отправляется"),
+        (SENT, "Отправлено"),
+        (FAILED, "Ошибка"),
+    ]
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name="Привычка",
+    )
+    scheduled_at = models.DateTimeField(verbose_name="Запланировано на")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    claimed_at = models.DateTimeField(verbose_name="Взято в работу", **NULLABLE)
+    sent_at = models.DateTimeField(verbose_name="Отправлено", **NULLABLE)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Статус",
+    )
+    error = models.CharField(max_length=200, blank=True, default="", verbose_name="Ошибка")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток отправки")
+
+    objects = ReminderDeliveryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Отправка напоминания"
+        verbose_name_plural = "Отправки напоминаний"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["habit", "scheduled_at"], name="unique_habit_occurrence"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "scheduled_at"], name="delivery_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit_id} - {self.scheduled_at}"
+
+
+class TelegramDeadLetter(models.Model):
+    """Чат, доставка в который невозможна: бот заблокирован, чат удалён или не существует.
+
+    Напоминания в такие чаты не отправляются, пока запись не удалят
+    (например, после повторной привязки Telegram).
+    """
+
+    chat_id = models.CharField(max_length=50, unique=True, verbose_name="Chat-ID Telegram")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа", **NULLABLE)
+    error = models.CharField(max_length=200, blank=True, default="", verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Недоставляемый чат"
+        verbose_name_plural = "Недоставляемые чаты"
+
+    def __str__(self):
+        return f"{self.chat_id} - {self.error}"
+
+
+class ReminderTick(models.Model):
+    """Телеметрия одного тика рассылки напоминаний"""
+
+    started_at = models.DateTimeField(verbose_name="Начало", db_index=True)
+    finished_at = models.DateTimeField(verbose_name="Окончание", **NULLABLE)
+    duration = models.FloatField(verbose_name="Длительность, с", **NULLABLE)
+    habits_scanned = models.PositiveIntegerField(default=0, verbose_name="Привычек наступило")
+    attempted = models.PositiveIntegerField(default=0, verbose_name="Попыток отправки")
+    sent = models.PositiveIntegerField(default=0, verbose_name="Отправлено")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Ошибок")
+    latency_p50 = models.FloatField(verbose_name="Telegram p50, с", **NULLABLE)
+    latency_p95 = models.FloatField(verbose_name="Telegram p95, с", **NULLABLE)
+    latency_max = models.FloatField(verbose_name="Telegram max, с", **NULLABLE)
+    lag_p50 = models.FloatField(verbose_name="Опоздание p50, с", **NULLABLE)
+    lag_p95 = models.FloatField(verbose_name="Опоздание p95, с", **NULLABLE)
+    lag_max = models.FloatField(verbose_name="Опоздание max, с", **NULLABLE)
+    latency_histogram = models.JSONField(default=dict, verbose_name="Гистограмма задержек Telegram")
+    lag_histogram = models.JSONField(default=dict, verbose_name="Гистограмма опозданий")
+
+    class Meta:
+        verbose_name = "Тик рассылки"
+        verbose_name_plural = "Тики рассылки"
+
+    def __str__(self):
+        return f"{self.started_at}"
+
+    @property
+    def overran(self):
+        """Тик не уложился в интервал beat и наложился на следующий"""
+
+        interval = settings.REMINDER_TICK_INTERVAL.total_seconds()
+        return self.duration is not None and self.duration > interval
+
+
+class HabitExport(models.Model):
+    """Фоновая выгрузка привычек в файл"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    ]
+    FORMAT_CHOICES = [("csv", "CSV"), ("jsonl", "JSON Lines"), ("parquet", "Parquet")]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="habit_exports", verbose_name="Пользователь"
+    )
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Формат")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус"
+    )
+    file = models.FileField(upload_to="exports/", verbose_name="Файл", **NULLABLE)
+    error = models.CharField(max_length=200, blank=True, default="", verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    finished_at = models.DateTimeField(verbose_name="Завершено", **NULLABLE)
+
+    class Meta:
+        verbose_name = "Выгрузка привычек"
+        verbose_name_plural = "Выгрузки привычек"
+
+    def __str__(self):
+        return f"{self.user} - {self.file_format} - {self.status}"
+
+
+class ReminderLoadBucket(models.Model):
+    """Число привычек с данной периодичностью, напоминание по которым приходится на минуту суток по UTC.
+
+    Поддерживается сигналами при изменении привычек и периодически
+    пересчитывается целиком, чтобы учесть пакетные операции без сигналов.
+    """
+
+    minute = models.PositiveSmallIntegerField(verbose_name="Минута суток по UTC")
+    periodicity = models.PositiveSmallIntegerField(verbose_name="Периодичность")
+    count = models.IntegerField(default=0, verbose_name="Привычек")
+
+    class Meta:
+        verbose_name = "Нагрузка напоминаний"
+        verbose_name_plural = "Нагрузка напоминаний"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["minute", "periodicity"], name="unique_reminder_load_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.minute // 60:02d}:{self.minute % 60:02d} / {self.periodicity}"
+
+
+class ImportCheckpoint(models.Model):
+    """Контрольная точка пакетного импорта: сколько строк файла уже обработано.
+
+    Обновляется в той же транзакции, что и запись пакета, поэтому после сбоя
+    импорт продолжается ровно с первого незаписанного пакета.
+    """
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="Импорт")
+    processed = models.PositiveBigIntegerField(default=0, verbose_name="Обработано строк")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+
+    def __str__(self):
+        return f"{self.name} - {self.processed}"
@@ -1,7 +1,25 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class MyPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class MyCursorPagination(CursorPagination):
+    """Пагинация по курсору (keyset) на стабильной сортировке по id.
+
+    Не выполняет COUNT(*) и OFFSET, поэтому любая страница стоит как первая.
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
+
+
+class CompletionCursorPagination(MyCursorPagination):
+    """История выполнений от новых к старым по индексу (habit, period)"""
+
+    ordering = "-period"
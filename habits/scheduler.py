@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from habits.models import Habit
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CHANNEL = "habits:schedule"
+
+
+class ScheduleFeed:
+    """Лента изменений расписания привычек через Redis pub/sub.
+
+    Сообщение — JSON-список пар [id привычки, момент напоминания в секундах
+    epoch или null для удалённой]. Без REMINDER_SCHEDULER_REDIS_URL публикация
+    отключена, и планировщик узнаёт об изменениях только при перечитывании окна.
+    """
+
+    def __init__(self):
+        self.client = None
+
+    def get_client(self):
+        if self.client is None and settings.REMINDER_SCHEDULER_REDIS_URL:
+            self.client = redis.Redis.from_url(settings.REMINDER_SCHEDULER_REDIS_URL)
+        return self.client
+
+    def publish(self, changes):
+        client = self.get_client()
+        if client is None or not changes:
+            return
+        payload = json.dumps(
+            [[pk, fire_at.timestamp() if fire_at else None] for pk, fire_at in changes]
+        )
+        try:
+            client.publish(SCHEDULE_CHANNEL, payload)
+        except redis.RedisError:
+            # Планировщик догонит изменение при следующем перечитывании окна
+            logger.warning("Не удалось опубликовать изменение расписания", exc_info=True)
+
+
+schedule_feed = ScheduleFeed()
+
+
+def decode_changes(payload):
+    return [(int(pk), timestamp) for pk, timestamp in json.loads(payload)]
+
+
+class ReminderScheduler:
+    """Планировщик напоминаний на куче ближайших наступлений.
+
+    В памяти держится только окно [сейчас, сейчас + horizon], но не больше
+    max_entries записей: при переполнении окно сужается до последней
+    поместившейся. Куча служит лишь таймером — что именно отправлять, решает
+    dispatch по next_fire_at в БД, поэтому устаревшие записи и совпадающие
+    моменты за границей окна не приводят к пропускам или повторам.
+    """
+
+    def __init__(self, dispatch, horizon, max_entries, refresh_interval):
+        self.dispatch = dispatch
+        self.horizon = horizon
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.heap = []
+        self.entries = {}
+        self.window_end = 0.0
+        self.refresh_at = 0.0
+        self.wakeup = asyncio.Event()
+        # Изменения из ленты, пришедшие во время перечитывания окна; None — перечитывания нет
+        self.buffered = None
+
+    def load(self, now=None):
+        """Перечитывает окно ближайших наступлений из БД"""
+
+        now = now or time.time()
+        return self.swap(self.read_window(now), now)
+
+    def read_window(self, now):
+        """Снимок окна из БД; выполняется в потоке и не трогает состояние планировщика"""
+
+        close_old_connections()
+        return list(
+            Habit.objects.filter(
+                next_fire_at__isnull=False,
+                next_fire_at__lte=datetime.fromtimestamp(now + self.horizon, dt_timezone.utc),
+            )
+            .order_by("next_fire_at")
+            .values_list("id", "next_fire_at")[: self.max_entries]
+        )
+
+    async def reload(self, now):
+        """Перечитывает окно в потоке и подменяет его в цикле событий.
+
+        Изменения, которые лента приносит во время чтения, копятся и применяются
+        поверх нового окна: иначе снимок из БД затёр бы их до следующего перечитывания.
+        """
+
+        self.buffered = []
+        try:
+            rows = await sync_to_async(self.read_window)(now)
+        finally:
+            buffered, self.buffered = self.buffered, None
+        loaded = self.swap(rows, now)
+        if buffered:
+            self.apply(buffered)
+        return loaded
+
+    def swap(self, rows, now):
+        """Заменяет окно снимком rows — парами (id, next_fire_at)"""
+
+        self.entries = {pk: fire_at.timestamp() for pk, fire_at in rows}
+        self.heap = [(timestamp, pk) for pk, timestamp in self.entries.items()]
+        heapq.heapify(self.heap)
+        if len(rows) == self.max_entries:
+            self.window_end = rows[-1][1].timestamp()
+        else:
+            self.window_end = now + self.horizon
+        self.refresh_at = now + self.refresh_interval
+        return len(rows)
+
+    def apply(self, changes):
+        """Учитывает изменения из ленты: добавляет, переносит или убирает наступления"""
+
+        if self.buffered is not None:
+            self.buffered.extend(changes)
+        for pk, timestamp in changes:
+            if timestamp is None or timestamp > self.window_end:
+                self.entries.pop(pk, None)
+                continue
+            self.entries[pk] = timestamp
+            heapq.heappush(self.heap, (timestamp, pk))
+        if len(self.entries) > self.max_entries:
+            kept = heapq.nsmallest(self.max_entries, self.entries.items(), key=lambda item: item[1])
+            self.entries = dict(kept)
+            self.window_end = kept[-1][1]
+        # Устаревшие записи удаляются лениво; если их накопилось много, куча пересобирается
+        if len(self.heap) > 2 * len(self.entries) + 1024:
+            self.heap = [(timestamp, pk) for pk, timestamp in self.entries.items()]
+            heapq.heapify(self.heap)
+        self.wakeup.set()
+
+    def next_due(self):
+        while self.heap and self.entries.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        due = []
+        while (timestamp := self.next_due()) is not None and timestamp <= now:
+            _, pk = heapq.heappop(self.heap)
+            del self.entries[pk]
+            due.append(pk)
+        return due
+
+    def dispatch_due(self, pks):
+        """Отправляет наступившие напоминания и возвращает новое расписание этих привычек"""
+
+        close_old_connections()
+        self.dispatch(timezone.now())
+        return [
+            (pk, fire_at.timestamp() if fire_at else None)
+            for pk, fire_at in Habit.objects.filter(pk__in=pks).values_list("id", "next_fire_at")
+        ]
+
+    async def listen(self, url):
+        while True:
+            client = aioredis.Redis.from_url(url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(SCHEDULE_CHANNEL)
+                    # Изменения, пришедшие до подписки, подхватит перечитывание окна
+                    self.refresh_at = 0.0
+                    self.wakeup.set()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.apply(decode_changes(message["data"]))
+            except redis.RedisError:
+                logger.warning("Лента изменений расписания недоступна, переподключение", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+    async def run(self):
+        url = settings.REMINDER_SCHEDULER_REDIS_URL
+        if url:
+            listener = asyncio.create_task(self.listen(url))
+        else:
+            listener = None
+            logger.warning(
+                "REMINDER_SCHEDULER_REDIS_URL не задан: изменения учитываются раз в %s с",
+                self.refresh_interval,
+            )
+        try:
+            while True:
+                now = time.time()
+                if now >= self.refresh_at:
+                    loaded = await self.reload(now)
+                    logger.info("Окно планировщика перечитано: %s наступлений", loaded)
+                due = self.pop_due(now)
+                if due:
+                    self.apply(await sync_to_async(self.dispatch_due)(due))
+                    continue
+                next_due = self.next_due()
+                timeout = self.refresh_at - now
+                if next_due is not None:
+                    timeout = min(timeout, next_due - now)
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if listener:
+                listener.cancel()
@@ -1,6 +1,14 @@
+from collections.abc import Mapping
+
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
-from .models import Habit
+from users.serializers import UserPublicSerializer
+from .completions import COUNTER_FIELDS, renumber_completions
+from .models import Habit, HabitCompletion, HabitExport, ReminderTick
+from .services import get_schedule, get_user_timezone
 from .validators import (
     AssociatedWithoutRewardValidator,
     TimeToCompleteValidator,
@@ -9,12 +17,41 @@ from .validators import (
     PeriodicityValidator,
 )
 
+EXPANDABLE_FIELDS = ("related_habit", "user")
+# Страницы публичной ленты кэшируются одни на всех клиентов, поэтому профиль владельца в них не раскрывается
+PUBLIC_EXPANDABLE_FIELDS = ("related_habit",)
+# Поля, которые меняются без правки привычки: расписание сдвигает тик рассылки, счётчики — отметки выполнения.
+# В публичной ленте их нет, чтобы эти изменения не сбрасывали её кэш
+VOLATILE_FIELDS = ("next_fire_at", "utc_minute", *COUNTER_FIELDS)
+
+
+def get_expand_fields(request, public=False):
+    """Поля, которые клиент попросил развернуть параметром ?expand=related_habit,user"""
+
+    if request is None:
+        return set()
+    allowed = PUBLIC_EXPANDABLE_FIELDS if public else EXPANDABLE_FIELDS
+    return set(request.query_params.get("expand", "").split(",")) & set(allowed)
+
+
+def copy_counters(source, target):
+    for field in COUNTER_FIELDS:
+        setattr(target, field, getattr(source, field))
+
+
+class RelatedHabitSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Habit
+        fields = ("id", "place", "time", "action", "pleasant_habit", "time_to_complete")
+
 
 class HabitSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Habit
         fields = "__all__"
+        read_only_fields = VOLATILE_FIELDS
         validators = [
             AssociatedWithoutRewardValidator(field1="related_habit", field2="reward"),
             TimeToCompleteValidator(field1="time_to_complete"),
@@ -26,3 +63,153 @@ class HabitSerializer(serializers.ModelSerializer):
             ),
             PeriodicityValidator(field1="periodicity"),
         ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get("request")
+        public = self.context.get("public_feed", False)
+        expand = get_expand_fields(request, public)
+        related_habit = instance.related_habit if "related_habit" in expand else None
+        # Чужую непубличную связанную привычку не раскрываем; в общей для всех ленте — никакую непубличную
+        own = not public and related_habit and related_habit.user_id == request.user.pk
+        if related_habit and (related_habit.is_published or own):
+            data["related_habit"] = RelatedHabitSerializer(related_habit).data
+        if "user" in expand and instance.user:
+            data["user"] = UserPublicSerializer(instance.user).data
+        if public:
+            for field in VOLATILE_FIELDS:
+                data.pop(field, None)
+        return data
+
+    def create(self, validated_data):
+        validated_data.update(
+            get_schedule(validated_data["time"], get_user_timezone(validated_data.get("user")))
+        )
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        rescheduled = "time" in validated_data or "periodicity" in validated_data
+        if rescheduled:
+            validated_data.update(
+                get_schedule(validated_data.get("time", instance.time), get_user_timezone(instance.user))
+            )
+        instance = super().update(instance, validated_data)
+        if rescheduled:
+            # Границы периодов следуют за днями напоминаний, поэтому отметки перенумеровываются
+            for habit in renumber_completions([instance.pk]):
+                copy_counters(habit, instance)
+        return instance
+
+
+class RelatedHabitField(serializers.PrimaryKeyRelatedField):
+    """Связанная привычка из словаря context["related_habits"], загруженного одним запросом"""
+
+    def to_internal_value(self, data):
+        related_habits = self.context.get("related_habits")
+        if related_habits is None:
+            return super().to_internal_value(data)
+        try:
+            habit = related_habits.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if habit is None:
+            self.fail("does_not_exist", pk_value=data)
+        return habit
+
+
+class HabitBulkListSerializer(serializers.ListSerializer):
+    """Пакетное создание и изменение привычек через bulk_create/bulk_update"""
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        if not isinstance(data, Mapping):
+            message = self.child.error_messages["invalid"].format(datatype=type(data).__name__)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code="invalid")
+        try:
+            pk = int(data.get("id"))
+        except (TypeError, ValueError):
+            pk = None
+        self.child.instance = self.instance.get(pk)
+        if self.child.instance is None:
+            raise serializers.ValidationError({"id": ["Привычка не найдена."]})
+        self.child.initial_data = data
+        validated_data = super().run_child_validation(data)
+        validated_data["id"] = self.child.instance.pk
+        return validated_data
+
+    def create(self, validated_data):
+        habits = [
+            Habit(**attrs, **get_schedule(attrs["time"], get_user_timezone(attrs.get("user"))))
+            for attrs in validated_data
+        ]
+        return Habit.objects.bulk_create(habits, batch_size=1000)
+
+    def update(self, instance, validated_data):
+        habits = []
+        fields = set()
+        rescheduled = []
+        for attrs in validated_data:
+            habit = instance[attrs.pop("id")]
+            if "time" in attrs or "periodicity" in attrs:
+                attrs.update(get_schedule(attrs.get("time", habit.time), get_user_timezone(habit.user)))
+                rescheduled.append(habit.pk)
+            for field, value in attrs.items():
+                setattr(habit, field, value)
+            fields.update(attrs)
+            habits.append(habit)
+        if fields:
+            Habit.objects.bulk_update(habits, fields, batch_size=1000)
+        if rescheduled:
+            renumbered = {habit.pk: habit for habit in renumber_completions(rescheduled)}
+            for habit in habits:
+                if habit.pk in renumbered:
+                    copy_counters(renumbered[habit.pk], habit)
+        return habits
+
+
+class HabitBulkSerializer(HabitSerializer):
+    related_habit = RelatedHabitField(
+        queryset=Habit.objects.all(), required=False, allow_null=True
+    )
+
+    class Meta(HabitSerializer.Meta):
+        read_only_fields = ("next_fire_at", "utc_minute", "user", *COUNTER_FIELDS)
+        list_serializer_class = HabitBulkListSerializer
+
+
+class HabitCompletionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = HabitCompletion
+        fields = ("id", "habit", "period", "completed_at")
+        read_only_fields = ("habit", "period")
+        extra_kwargs = {"completed_at": {"required": False}}
+
+    def validate_completed_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Нельзя отметить выполнение в будущем.")
+        return value
+
+
+class ReminderTickSerializer(serializers.ModelSerializer):
+    overran = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ReminderTick
+        fields = "__all__"
+
+
+class HabitExportSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HabitExport
+        fields = ("id", "file_format", "status", "error", "created_at", "finished_at", "download_url")
+
+    def get_download_url(self, obj):
+        if obj.status != HabitExport.DONE:
+            return None
+        url = reverse("habits:habit-export-download", kwargs={"pk": obj.pk})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
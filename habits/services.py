@@ -1,6 +1,27 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+
+def get_telegram_url(method):
+    """Адрес метода Bot API"""
+
+    return f"{settings.TELEGRAM_URL_BOT}{settings.TG_BOT_TOKEN}/{method}"
+
 
-from config.settings import TG_BOT_TOKEN
+def get_telegram_timeout():
+    """Таймауты (соединение, ответ) для запросов к Bot API"""
+
+    return settings.TELEGRAM_CONNECT_TIMEOUT, settings.TELEGRAM_TIMEOUT
 
 
 def send_telegram_message(message, chat_id):
@@ -11,9 +32,314 @@ def send_telegram_message(message, chat_id):
         "chat_id": chat_id,
     }
     response = requests.get(
-        f"https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage",
+        get_telegram_url("sendMessage"),
         params=params,
-        timeout=10,
+        timeout=get_telegram_timeout(),
     )
     if not response.ok:
         raise RuntimeError("Не удалось отправить сообщение Telegram")
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: не больше rate токенов в секунду"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedRateLimiter:
+    """Общий для всех воркеров лимит частоты: не больше rate запросов в секунду.
+
+    Счётчик текущей секунды хранится в общем кэше, поэтому параллельные
+    подзадачи рассылки вместе не превышают лимит бота, а не каждая по отдельности.
+    """
+
+    def __init__(self, name):
+        self.prefix = f"ratelimit:{name}"
+
+    def acquire(self, rate):
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f"{self.prefix}:{window}"
+            cache.add(key, 0, 2)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # Запись окна истекла между add и incr — пробуем снова
+                continue
+            if count <= rate:
+                return
+            time.sleep(window + 1 - now)
+
+
+telegram_rate_limiter = SharedRateLimiter("telegram")
+
+
+class CircuitBreaker:
+    """Предохранитель для внешнего API.
+
+    После threshold сбоев подряд (в пределах окна window секунд) размыкается на
+    cooldown секунд, и запросы не выполняются. Затем пропускает запросы снова:
+    первый же сбой размыкает его повторно, успех сбрасывает счётчик. Состояние
+    хранится в общем кэше, поэтому одинаково для всех воркеров.
+    """
+
+    def __init__(self, name):
+        self.failures_key = f"circuit:{name}:failures"
+        self.open_key = f"circuit:{name}:open_until"
+
+    def is_open(self):
+        return (cache.get(self.open_key) or 0) > time.time()
+
+    def record_failure(self):
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            cache.add(self.failures_key, 0, settings.TELEGRAM_CIRCUIT_WINDOW)
+            failures = cache.incr(self.failures_key)
+        if failures >= settings.TELEGRAM_CIRCUIT_THRESHOLD:
+            cooldown = settings.TELEGRAM_CIRCUIT_COOLDOWN
+            cache.set(self.open_key, time.time() + cooldown, cooldown)
+            # Счётчик остаётся на пороге: после паузы хватит одного сбоя, чтобы снова разомкнуть
+            cache.set(
+                self.failures_key,
+                settings.TELEGRAM_CIRCUIT_THRESHOLD - 1,
+                cooldown + settings.TELEGRAM_CIRCUIT_WINDOW,
+            )
+
+    def record_success(self):
+        cache.delete(self.failures_key)
+
+    def state(self):
+        open_until = cache.get(self.open_key) or 0
+        return {
+            "open": open_until > time.time(),
+            "open_until": open_until if open_until > time.time() else None,
+            "failures": cache.get(self.failures_key) or 0,
+        }
+
+
+telegram_circuit = CircuitBreaker("telegram")
+
+# Ошибки 400, после которых повторять отправку в этот чат бессмысленно
+PERMANENT_ERRORS = ("chat not found", "user is deactivated", "bot was blocked", "chat_id is empty")
+
+
+def parse_telegram_error(response):
+    """Описание ошибки Bot API и пауза parameters.retry_after, если Telegram её прислал"""
+
+    try:
+        payload = response.json()
+    except ValueError:
+        return response.text[:200], None
+    return str(payload.get("description", ""))[:200], (payload.get("parameters") or {}).get("retry_after")
+
+
+def is_permanent_error(status_code, description):
+    """Бот заблокирован, чат удалён или не существует"""
+
+    if status_code == 403:
+        return True
+    return status_code == 400 and any(text in description.lower() for text in PERMANENT_ERRORS)
+
+
+def get_retry_delay(attempt, retry_after=None):
+    """Пауза перед повтором: retry_after от Telegram или экспоненциальная с разбросом"""
+
+    if retry_after is not None:
+        return float(retry_after)
+    delay = settings.TELEGRAM_RETRY_BACKOFF * 2**attempt
+    return random.uniform(delay / 2, delay)
+
+
+@dataclass
+class TelegramResult:
+    """Результат отправки одного сообщения.
+
+    permanent — доставка в этот чат невозможна в принципе; shed — запрос не
+    выполнялся, потому что предохранитель разомкнут.
+    """
+
+    chat_id: str
+    ok: bool
+    status_code: int | None = None
+    error: str = ""
+    latency: float = 0.0
+    attempts: int = 0
+    permanent: bool = False
+    shed: bool = False
+
+
+def send_telegram_messages(messages, max_connections=None):
+    """Пакетная отправка сообщений Telegram.
+
+    messages — последовательность пар (chat_id, text). Запросы идут через общий
+    пул keep-alive соединений с ограниченной параллельностью и соблюдают
+    общий для всех воркеров лимит бота и лимит на чат (чат должен целиком
+    приходиться на один вызов, см. partition_by_user). Сетевые ошибки, 429 и
+    5xx повторяются до TELEGRAM_MAX_RETRIES раз с паузой, пока предохранитель
+    не разомкнётся.
+    Возвращает список TelegramResult в порядке входных сообщений; ошибки
+    отдельных сообщений не прерывают отправку.
+    """
+
+    messages = list(messages)
+    max_connections = max_connections or settings.TELEGRAM_MAX_CONNECTIONS
+    url = get_telegram_url("sendMessage")
+    chat_buckets = {
+        chat_id: TokenBucket(settings.TELEGRAM_CHAT_RATE_LIMIT, capacity=1)
+        for chat_id, _ in messages
+    }
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def post(chat_id, text, attempt):
+            """Одна попытка; возвращает результат и паузу retry_after, если она есть"""
+
+            chat_buckets[chat_id].acquire()
+            telegram_rate_limiter.acquire(settings.TELEGRAM_RATE_LIMIT)
+            started = time.monotonic()
+            try:
+                response = session.post(
+                    url, json={"chat_id": chat_id, "text": text}, timeout=get_telegram_timeout()
+                )
+            except requests.RequestException as exc:
+                telegram_circuit.record_failure()
+                return TelegramResult(
+                    chat_id, False, error=str(exc)[:200], latency=time.monotonic() - started, attempts=attempt
+                ), None
+            latency = time.monotonic() - started
+            if response.ok:
+                telegram_circuit.record_success()
+                return TelegramResult(chat_id, True, response.status_code, latency=latency, attempts=attempt), None
+            if response.status_code >= 500:
+                telegram_circuit.record_failure()
+            description, retry_after = parse_telegram_error(response)
+            return TelegramResult(
+                chat_id,
+                False,
+                response.status_code,
+                description,
+                latency,
+                attempt,
+                permanent=is_permanent_error(response.status_code, description),
+            ), retry_after
+
+        def send(item):
+            chat_id, text = item
+            for attempt in range(1, settings.TELEGRAM_MAX_RETRIES + 2):
+                if telegram_circuit.is_open():
+                    return TelegramResult(
+                        chat_id, False, error="Telegram недоступен, отправка отложена", attempts=attempt - 1, shed=True
+                    )
+                result, retry_after = post(chat_id, text, attempt)
+                retryable = result.status_code is None or result.status_code == 429 or result.status_code >= 500
+                if result.ok or not retryable or attempt > settings.TELEGRAM_MAX_RETRIES:
+                    return result
+                delay = get_retry_delay(attempt - 1, retry_after)
+                if delay > settings.TELEGRAM_RETRY_MAX_DELAY:
+                    # Долгую паузу выдерживает не воркер, а следующий тик рассылки
+                    return result
+                time.sleep(delay)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            return list(executor.map(send, messages))
+
+
+def get_user_timezone(user):
+    """Часовой пояс владельца привычки; для привычек без владельца — пояс проекта"""
+
+    return user.zoneinfo if user is not None else timezone.get_default_timezone()
+
+
+def get_fire_at_on(local_date, habit_time, tz):
+    """Момент напоминания в заданный местный день с учётом смещения пояса на эту дату"""
+
+    return timezone.make_aware(datetime.combine(local_date, habit_time), tz)
+
+
+def get_utc_minute(fire_at):
+    """Минута суток напоминания по UTC"""
+
+    fire_at = fire_at.astimezone(dt_timezone.utc)
+    return fire_at.hour * 60 + fire_at.minute
+
+
+def get_next_fire_at(habit_time, after=None, tz=None):
+    """Ближайший момент напоминания о привычке по местному времени tz, не раньше after"""
+
+    after = after or timezone.now()
+    tz = tz or timezone.get_default_timezone()
+    local_date = timezone.localtime(after, tz).date()
+    fire_at = get_fire_at_on(local_date, habit_time, tz)
+    if fire_at < after:
+        fire_at = get_fire_at_on(local_date + timedelta(days=1), habit_time, tz)
+    return fire_at
+
+
+def get_schedule(habit_time, tz=None, after=None):
+    """Поля расписания привычки: ближайшее напоминание и его минута суток по UTC"""
+
+    fire_at = get_next_fire_at(habit_time, after, tz)
+    return {"next_fire_at": fire_at, "utc_minute": get_utc_minute(fire_at)}
+
+
+def get_following_fire_at(fire_at, periodicity, now=None, habit_time=None, tz=None):
+    """Следующий после отправки момент напоминания с учётом периодичности.
+
+    Шаг считается в местных календарных днях, поэтому после перехода на летнее
+    время напоминание остаётся в то же местное время. Пропущенные повторы не
+    догоняются: результат всегда в будущем.
+    """
+
+    now = now or timezone.now()
+    tz = tz or timezone.get_default_timezone()
+    local_fire_at = timezone.localtime(fire_at, tz)
+    habit_time = habit_time or local_fire_at.time()
+    step = periodicity or 1
+    local_date = local_fire_at.date() + timedelta(days=step)
+    behind = (timezone.localtime(now, tz).date() - local_date).days
+    if behind > 0:
+        local_date += timedelta(days=(behind // step) * step)
+    following = get_fire_at_on(local_date, habit_time, tz)
+    if following <= now:
+        following = get_fire_at_on(local_date + timedelta(days=step), habit_time, tz)
+    return following
+
+
+def get_period_index(moment, periodicity, tz=None, anchor=None):
+    """Номер периода привычки, в который попадает момент.
+
+    Период — periodicity суток по местному времени tz, как и шаг в
+    get_following_fire_at. Границы периодов совпадают с днями напоминаний:
+    anchor — местная дата любого из них (например, ближайшего), без неё
+    периоды отсчитываются от начала календаря.
+    """
+
+    step = periodicity or 1
+    offset = anchor.toordinal() % step if anchor else 0
+    local_date = timezone.localtime(moment, tz or timezone.get_default_timezone()).date()
+    return (local_date.toordinal() - offset) // step
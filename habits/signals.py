@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from habits.analytics import move_reminder_load
+from habits.cache import (
+    PUBLIC_FEED_VERSION_KEY,
+    bump_version,
+    habit_version_key,
+    user_habits_version_key,
+)
+from habits.completions import COUNTER_FIELDS
+from habits.models import Habit, TelegramDeadLetter
+from habits.scheduler import schedule_feed
+from habits.tasks import reschedule_user_habits
+from users.models import User
+
+
+def invalidate_referencing_habits(habit):
+    """Сбрасывает версии привычек, которые показывают эту как развёрнутую связанную"""
+
+    if habit.pleasant_habit:
+        referencing = list(Habit.objects.filter(related_habit_id=habit.pk).only("id", "user_id"))
+        # Списки владельцев с ?expand=related_habit тоже показывают её, поэтому их версии сбрасываются вместе
+        keys = {user_habits_version_key(item.user_id) for item in referencing}
+        keys.update(habit_version_key(item.pk) for item in referencing)
+        cache.delete_many(list(keys))
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved(sender, instance, created, update_fields=None, **kwargs):
+    bump_version(user_habits_version_key(instance.user_id))
+    bump_version(habit_version_key(instance.pk))
+    if update_fields is not None and set(update_fields) <= set(COUNTER_FIELDS):
+        # Отметка выполнения: счётчиков нет ни в публичной ленте, ни в развёрнутых связанных, расписание то же
+        return
+    # Без загруженного состояния прежнюю публичность узнать нельзя — считаем, что была
+    loaded = getattr(instance, "_loaded_values", None)
+    was_published = not created and (loaded or {}).get("is_published", True)
+    if instance.is_published or was_published:
+        bump_version(PUBLIC_FEED_VERSION_KEY)
+    if not created:
+        invalidate_referencing_habits(instance)
+    changes = [(instance.pk, instance.next_fire_at)]
+    transaction.on_commit(lambda: schedule_feed.publish(changes))
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved_reminder_load(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_values", None)
+    if created:
+        move_reminder_load([(None, instance.utc_minute, instance.periodicity)])
+    elif loaded and "utc_minute" in loaded and "periodicity" in loaded:
+        if loaded["periodicity"] == instance.periodicity:
+            move_reminder_load([(loaded["utc_minute"], instance.utc_minute, instance.periodicity)])
+        else:
+            move_reminder_load(
+                [
+                    (loaded["utc_minute"], None, loaded["periodicity"]),
+                    (None, instance.utc_minute, instance.periodicity),
+                ]
+            )
+    # Без исходного состояния изменение не учесть; расхождение исправит периодический пересчёт
+
+
+@receiver(post_save, sender=Habit)
+def remember_saved_state(sender, instance, **kwargs):
+    # Регистрируется последним: следующие сохранения того же объекта сравниваются с этим состоянием
+    instance._loaded_values = {
+        **getattr(instance, "_loaded_values", {}),
+        "is_published": instance.is_published,
+        "utc_minute": instance.utc_minute,
+        "periodicity": instance.periodicity,
+    }
+
+
+@receiver(post_delete, sender=Habit)
+def habit_deleted(sender, instance, **kwargs):
+    move_reminder_load([(instance.utc_minute, None, instance.periodicity)])
+    if instance.is_published:
+        bump_version(PUBLIC_FEED_VERSION_KEY)
+    bump_version(user_habits_version_key(instance.user_id))
+    bump_version(habit_version_key(instance.pk))
+    changes = [(instance.pk, None)]
+    transaction.on_commit(lambda: schedule_feed.publish(changes))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Список привычек с ?expand=user показывает профиль владельца
+    bump_version(user_habits_version_key(instance.pk))
+    loaded = getattr(instance, "_loaded_values", None)
+    if not created and loaded and loaded.get("timezone", instance.timezone) != instance.timezone:
+        # Местное время привычек остаётся прежним, меняются моменты напоминаний по UTC
+        transaction.on_commit(lambda: reschedule_user_habits.delay(instance.pk))
+    if instance.tg_chat_id and (loaded or {}).get("tg_chat_id") != instance.tg_chat_id:
+        # Чат заново привязан — значит, бот снова может в него писать
+        TelegramDeadLetter.objects.filter(chat_id=instance.tg_chat_id).delete()
+    instance._loaded_values = {**(loaded or {}), "timezone": instance.timezone, "tg_chat_id": instance.tg_chat_id}
@@ -1,23 +1,386 @@
-from datetime import datetime, timedelta
+import logging
+import tempfile
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
 
-import pytz
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
-from config import settings
-from habits.models import Habit
-from habits.services import send_telegram_message
+from habits.analytics import move_reminder_load, rebuild_reminder_load
+from habits.cache import invalidate_habit_schedules, invalidate_user_habits
+from habits.completions import renumber_completions
+from habits.exports import ExportError, get_export_queryset, iter_habit_rows, write_export
+from habits.models import Habit, HabitExport, ReminderDelivery, ReminderTick, TelegramDeadLetter
+from habits.scheduler import schedule_feed
+from habits.services import (
+    get_fire_at_on,
+    get_following_fire_at,
+    get_schedule,
+    get_user_timezone,
+    get_utc_minute,
+    send_telegram_messages,
+    telegram_circuit,
+)
+from habits.telemetry import (
+    LAG_BUCKETS,
+    LATENCY_BUCKETS,
+    histogram_percentile,
+    make_histogram,
+    merge_histograms,
+)
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def partition_by_user(deliveries, shard_count, chunk_size):
+    """Раскладывает пары (id, user_id) по шардам (хэш id пользователя) и собирает шарды в порции.
+
+    Все напоминания одного пользователя попадают в одну порцию, поэтому лимит
+    Telegram на чат соблюдается внутри одной подзадачи. Порция больше
+    chunk_size, только если столько напоминаний у одного пользователя.
+    """
+
+    shards = [defaultdict(list) for _ in range(shard_count)]
+    for pk, user_id in deliveries:
+        shards[(user_id or 0) % shard_count][user_id].append(pk)
+    chunks = []
+    for shard in shards:
+        chunk = []
+        for pks in shard.values():
+            if chunk and len(chunk) + len(pks) > chunk_size:
+                chunks.append(chunk)
+                chunk = []
+            chunk.extend(pks)
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+def schedule_due_deliveries(now):
+    """Записывает в журнал наступившие напоминания и сдвигает их следующий запуск.
+
+    Выполняется в одной транзакции: повторный запуск не найдёт уже
+    запланированные привычки, а уникальный ключ (привычка, время) не даст
+    записать одно наступление дважды.
+    """
+
+    with transaction.atomic():
+        habits = list(
+            Habit.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(next_fire_at__lte=now)
+            .select_related("user")
+            .only("id", "time", "periodicity", "next_fire_at", "utc_minute", "user__timezone")
+        )
+        ReminderDelivery.objects.bulk_create(
+            [
+                ReminderDelivery(habit_id=habit.pk, scheduled_at=habit.next_fire_at)
+                for habit in habits
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        for habit in habits:
+            habit.next_fire_at = get_following_fire_at(
+                habit.next_fire_at, habit.periodicity, now, habit.time, get_user_timezone(habit.user)
+            )
+            habit.utc_minute = get_utc_minute(habit.next_fire_at)
+        Habit.objects.bulk_update(habits, ["next_fire_at", "utc_minute"], batch_size=1000)
+    invalidate_habit_schedules(habits)
+    return len(habits)
+
+
+def dispatch_due_reminders(now):
+    """Журналирует наступившие к now напоминания и раздаёт их воркерам порциями"""
+
+    tick = ReminderTick.objects.create(started_at=now)
+    tick.habits_scanned = schedule_due_deliveries(now)
+    tick.save(update_fields=["habits_scanned"])
+    if telegram_circuit.is_open():
+        # Telegram недоступен: наступления записаны в журнал и уйдут, когда предохранитель замкнётся
+        logger.warning("Предохранитель Telegram разомкнут, рассылка тика %s отложена", tick.pk)
+        aggregate_reminder_results([], tick.pk)
+        return 0
+    reclaimed = ReminderDelivery.objects.stale_sending(now).update(
+        status=ReminderDelivery.PENDING, attempts=F("attempts") + 1
+    )
+    if reclaimed:
+        logger.warning("Возвращено в очередь зависших отправок: %s", reclaimed)
+    deliveries = ReminderDelivery.objects.pending().values_list("id", "habit__user_id")
+    chunks = partition_by_user(
+        deliveries, settings.REMINDER_SHARD_COUNT, settings.REMINDER_CHUNK_SIZE
+    )
+    if chunks:
+        chord(send_habit_reminders.s(chunk) for chunk in chunks)(
+            aggregate_reminder_results.s(tick.pk)
+        )
+    else:
+        aggregate_reminder_results([], tick.pk)
+    return len(chunks)
 
 
 @shared_task
 def telegram_notification():
-    zone = pytz.timezone(settings.TIME_ZONE)
-    current_time = datetime.now(zone)
-    current_time_less = current_time - timedelta(minutes=5)
-    habits = Habit.objects.filter(
-        time__lte=current_time.time(), time__gte=current_time_less.time()
+    """Координатор рассылки по расписанию beat; при запущенном планировщике — страховочный проход"""
+
+    return dispatch_due_reminders(timezone.now())
+
+
+@shared_task
+def send_habit_reminders(delivery_ids):
+    """Отправка напоминаний по одной порции журнала.
+
+    Забирает только ещё не взятые в работу записи, так что повторная
+    доставка той же порции ничего не отправляет.
+    """
+
+    with transaction.atomic():
+        deliveries = list(
+            ReminderDelivery.objects.select_for_update(skip_locked=True, of=("self",))
+            .pending()
+            .filter(pk__in=delivery_ids)
+            .select_related("habit__user")
+        )
+        ReminderDelivery.objects.filter(
+            pk__in=[delivery.pk for delivery in deliveries]
+        ).update(status=ReminderDelivery.SENDING, claimed_at=timezone.now())
+
+    now = timezone.now()
+    chat_ids = {delivery.habit.user.tg_chat_id for delivery in deliveries if delivery.habit.user}
+    dead_chats = set(
+        TelegramDeadLetter.objects.filter(chat_id__in=chat_ids).values_list("chat_id", flat=True)
+    )
+    to_send = []
+    for delivery in deliveries:
+        user = delivery.habit.user
+        delivery.status = ReminderDelivery.FAILED
+        if not user or not user.tg_chat_id:
+            delivery.error = "Не указан Telegram chat id"
+        elif user.tg_chat_id in dead_chats:
+            delivery.error = "Чат в списке недоставляемых"
+        elif now - delivery.scheduled_at > settings.REMINDER_MAX_AGE:
+            delivery.error = "Напоминание устарело"
+        else:
+            to_send.append(delivery)
+
+    results = send_telegram_messages(
+        (
+            delivery.habit.user.tg_chat_id,
+            f"Я буду {delivery.habit.action} в {delivery.habit.time} в {delivery.habit.place}",
+        )
+        for delivery in to_send
+    )
+    sent_at = timezone.now()
+    lags = []
+    dead_letters = {}
+    for delivery, result in zip(to_send, results):
+        delivery.error = result.error[:200]
+        if result.ok:
+            delivery.status = ReminderDelivery.SENT
+            delivery.sent_at = sent_at
+            lags.append((sent_at - delivery.scheduled_at).total_seconds())
+            continue
+        if not result.shed:
+            delivery.attempts += 1
+        if result.permanent:
+            dead_letters[result.chat_id] = TelegramDeadLetter(
+                chat_id=result.chat_id, status_code=result.status_code, error=result.error[:200]
+            )
+        elif delivery.attempts < settings.REMINDER_MAX_ATTEMPTS:
+            # Временный сбой: запись вернётся в очередь и будет отправлена следующим тиком
+            delivery.status = ReminderDelivery.PENDING
+        logger.warning(
+            "Не удалось отправить напоминание в чат %s: %s", result.chat_id, result.error
+        )
+    ReminderDelivery.objects.bulk_update(
+        deliveries, ["status", "sent_at", "error", "attempts"], batch_size=1000
+    )
+    if dead_letters:
+        TelegramDeadLetter.objects.bulk_create(
+            dead_letters.values(),
+            update_conflicts=True,
+            unique_fields=["chat_id"],
+            update_fields=["status_code", "error", "updated_at"],
+        )
+
+    sent = sum(result.ok for result in results)
+    return {
+        "habits": len(deliveries),
+        "attempted": sum(not result.shed for result in results),
+        "sent": sent,
+        "failed": sum(delivery.status == ReminderDelivery.FAILED for delivery in deliveries),
+        "deferred": sum(delivery.status == ReminderDelivery.PENDING for delivery in deliveries),
+        "dead_letters": len(dead_letters),
+        # Отложенные предохранителем сообщения в Telegram не уходили, их нулевая задержка исказила бы перцентили
+        "latency": make_histogram([result.latency for result in results if not result.shed], LATENCY_BUCKETS),
+        "lag": make_histogram(lags, LAG_BUCKETS),
+    }
+
+
+@shared_task
+def aggregate_reminder_results(results, tick_id=None):
+    """Сводит счётчики и гистограммы всех порций одного тика рассылки и сохраняет телеметрию"""
+
+    totals = {"habits": 0, "attempted": 0, "sent": 0, "failed": 0, "deferred": 0, "dead_letters": 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result.get(key, 0)
+    latency = merge_histograms([result["latency"] for result in results], LATENCY_BUCKETS)
+    lag = merge_histograms([result["lag"] for result in results], LAG_BUCKETS)
+
+    if tick_id is not None:
+        tick = ReminderTick.objects.get(pk=tick_id)
+        tick.finished_at = timezone.now()
+        tick.duration = (tick.finished_at - tick.started_at).total_seconds()
+        tick.attempted = totals["attempted"]
+        tick.sent = totals["sent"]
+        tick.failed = totals["failed"]
+        tick.latency_p50 = histogram_percentile(latency, LATENCY_BUCKETS, 50)
+        tick.latency_p95 = histogram_percentile(latency, LATENCY_BUCKETS, 95)
+        tick.latency_max = latency["max"] if totals["attempted"] else None
+        tick.lag_p50 = histogram_percentile(lag, LAG_BUCKETS, 50)
+        tick.lag_p95 = histogram_percentile(lag, LAG_BUCKETS, 95)
+        tick.lag_max = lag["max"] if totals["sent"] else None
+        tick.latency_histogram = latency
+        tick.lag_histogram = lag
+        tick.save()
+        if tick.overran:
+            logger.warning("Тик рассылки %s длился %.1f с и не уложился в интервал", tick.pk, tick.duration)
+
+    logger.info("Тик рассылки напоминаний завершён: %s", totals)
+    return totals
+
+
+@shared_task
+def export_habits(export_id):
+    """Фоновая выгрузка привычек в файл для последующего скачивания"""
+
+    export = HabitExport.objects.select_related("user").get(pk=export_id)
+    export.status = HabitExport.RUNNING
+    export.save(update_fields=["status"])
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f"habits-{export.pk}.{export.file_format}"
+            write_export(
+                iter_habit_rows(get_export_queryset(export.user)), export.file_format, path
+            )
+            with open(path, "rb") as file:
+                export.file.save(path.name, File(file), save=False)
+        export.status = HabitExport.DONE
+    except ExportError as exc:
+        export.status = HabitExport.FAILED
+        export.error = str(exc)
+    except Exception:
+        # Непредвиденный сбой: выгрузка не должна навсегда остаться в статусе «выполняется»
+        export.status = HabitExport.FAILED
+        export.error = "Внутренняя ошибка при формировании выгрузки"
+        export.finished_at = timezone.now()
+        export.save()
+        raise
+    export.finished_at = timezone.now()
+    export.save()
+
+
+@shared_task
+def prune_reminder_deliveries(batch_size=10000):
+    """Удаление из журнала завершённых записей старше REMINDER_DELIVERY_RETENTION.
+
+    Удаляет порциями, чтобы не держать долгие блокировки на большой таблице.
+    """
+
+    queryset = ReminderDelivery.objects.filter(
+        status__in=(ReminderDelivery.SENT, ReminderDelivery.FAILED),
+        scheduled_at__lt=timezone.now() - settings.REMINDER_DELIVERY_RETENTION,
     )
+    deleted = 0
+    while pks := list(queryset.values_list("pk", flat=True)[:batch_size]):
+        deleted += ReminderDelivery.objects.filter(pk__in=pks).delete()[0]
+    logger.info("Из журнала напоминаний удалено записей: %s", deleted)
+    return deleted
+
+
+@shared_task
+def rebuild_reminder_load_buckets():
+    """Пересчёт гистограммы нагрузки: исправляет расхождения после массовых операций в обход сигналов"""
+
+    buckets = rebuild_reminder_load()
+    logger.info("Гистограмма нагрузки напоминаний пересчитана: %s корзин", buckets)
+    return buckets
+
+
+@shared_task
+def reschedule_user_habits(user_id):
+    """Пересчёт напоминаний пользователя после смены часового пояса"""
+
+    user = User.objects.get(pk=user_id)
+    habits = list(Habit.objects.filter(user=user).only("id", "time", "periodicity", "utc_minute"))
+    moves = []
     for habit in habits:
-        user_tg = habit.user.tg_chat_id
-        if user_tg:
-            message = f"Я буду {habit.action} в {habit.time} в {habit.place}"
-            send_telegram_message(message, user_tg)
+        old_minute = habit.utc_minute
+        for field, value in get_schedule(habit.time, user.zoneinfo).items():
+            setattr(habit, field, value)
+        moves.append((old_minute, habit.utc_minute, habit.periodicity))
+    Habit.objects.bulk_update(habits, ["next_fire_at", "utc_minute"], batch_size=1000)
+    move_reminder_load(moves)
+    # Периоды отметок считаются по местным дням напоминаний, а они сменились вместе с поясом
+    renumber_completions([habit.pk for habit in habits])
+    schedule_feed.publish([(habit.pk, habit.next_fire_at) for habit in habits])
+    invalidate_user_habits(user_id, [habit.pk for habit in habits])
+    return len(habits)
+
+
+def get_shifting_timezones(now, horizon):
+    """Часовые пояса пользователей, у которых смещение от UTC меняется в окне [now - 1 день, now + horizon]"""
+
+    names = set(User.objects.order_by().values_list("timezone", flat=True).distinct())
+    shifting = []
+    for name in names:
+        tz = ZoneInfo(name)
+        offsets = {
+            (now + timedelta(days=day)).astimezone(tz).utcoffset()
+            for day in range(-1, horizon.days + 2)
+        }
+        if len(offsets) > 1:
+            shifting.append(name)
+    return shifting
+
+
+@shared_task
+def recompute_fire_times():
+    """Сверка расписания с правилами часовых поясов вокруг переходов на летнее время.
+
+    Следующее напоминание считается в местных днях и само учитывает переход, но
+    минута по UTC меняется в обход сигналов, а правила поясов могут обновиться
+    вместе с tzdata. Поэтому для поясов с переходом рядом момент напоминания
+    пересобирается из местной даты и времени привычки.
+    """
+
+    now = timezone.now()
+    timezones = get_shifting_timezones(now, settings.REMINDER_DST_HORIZON)
+    if not timezones:
+        return 0
+    changed = []
+    habits = (
+        Habit.objects.filter(user__timezone__in=timezones, next_fire_at__isnull=False)
+        .select_related("user")
+        .only("id", "time", "periodicity", "next_fire_at", "utc_minute", "user__timezone")
+    )
+    for habit in habits.iterator(chunk_size=2000):
+        tz = habit.user.zoneinfo
+        fire_at = get_fire_at_on(timezone.localtime(habit.next_fire_at, tz).date(), habit.time, tz)
+        utc_minute = get_utc_minute(fire_at)
+        if fire_at != habit.next_fire_at or utc_minute != habit.utc_minute:
+            habit.next_fire_at, habit.utc_minute = fire_at, utc_minute
+            changed.append(habit)
+    Habit.objects.bulk_update(changed, ["next_fire_at", "utc_minute"], batch_size=1000)
+    invalidate_habit_schedules(changed)
+    # Тик сдвигает минуту по UTC пакетно в обход сигналов, поэтому гистограмма пересчитывается целиком
+    rebuild_reminder_load()
+    logger.info("Расписание пересчитано для поясов %s: изменено %s привычек", timezones, len(changed))
+    return len(changed)
@@ -0,0 +1,38 @@
+import math
+
+# Границы корзин гистограмм, в секундах
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, math.inf)
+
+
+def make_histogram(values, buckets):
+    """Гистограмма значений по фиксированным корзинам; сериализуется в JSON для результатов Celery"""
+
+    counts = [0] * len(buckets)
+    for value in values:
+        counts[next(index for index, bound in enumerate(buckets) if value <= bound)] += 1
+    return {"counts": counts, "sum": sum(values), "max": max(values, default=0)}
+
+
+def merge_histograms(histograms, buckets):
+    merged = {"counts": [0] * len(buckets), "sum": 0, "max": 0}
+    for histogram in histograms:
+        merged["counts"] = [a + b for a, b in zip(merged["counts"], histogram["counts"])]
+        merged["sum"] += histogram["sum"]
+        merged["max"] = max(merged["max"], histogram["max"])
+    return merged
+
+
+def histogram_percentile(histogram, buckets, percent):
+    """Оценка перцентиля сверху: граница корзины, в которую он попал"""
+
+    total = sum(histogram["counts"])
+    if not total:
+        return None
+    threshold = percent / 100 * total
+    cumulative = 0
+    for bound, count in zip(buckets, histogram["counts"]):
+        cumulative += count
+        if cumulative >= threshold:
+            return min(bound, histogram["max"])
+    return histogram["max"]
@@ -1,7 +1,72 @@
+import csv
+import json
+import re
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from habits.models import Habit
+from config.metrics import registry
+from config.openapi import get_code_version, render_schema, schema_artifacts
+from habits.async_views import HabitListAsyncView, HabitRetrieveAsyncView, PublishedHabitListAsyncView
+from habits.analytics import get_reminder_load, rebuild_reminder_load
+from habits.benchmarks import STARTUP_TARGETS, FakeTelegramServer, compare_results, measure_startup
+from habits.cache import (
+    PUBLIC_FEED_VERSION_KEY,
+    get_version,
+    habit_version_key,
+    public_feed_cache,
+    user_habits_version_key,
+)
+from habits.completions import complete_habit, renumber_completions
+from habits.management.commands.bulk_import import Command as BulkImportCommand, copy_objects
+from habits.models import (
+    Habit,
+    HabitExport,
+    ImportCheckpoint,
+    ReminderDelivery,
+    ReminderLoadBucket,
+    ReminderTick,
+    TelegramDeadLetter,
+)
+from habits.scheduler import ReminderScheduler, ScheduleFeed, decode_changes
+from habits.services import (
+    SharedRateLimiter,
+    TelegramResult,
+    get_schedule,
+    get_following_fire_at,
+    get_next_fire_at,
+    get_utc_minute,
+    send_telegram_messages,
+    telegram_circuit,
+)
+from habits.tasks import (
+    aggregate_reminder_results,
+    export_habits,
+    get_shifting_timezones,
+    partition_by_user,
+    prune_reminder_deliveries,
+    recompute_fire_times,
+    schedule_due_deliveries,
+    send_habit_reminders,
+    telegram_notification,
+)
 from users.models import User
 
 
@@ -50,6 +115,112 @@ class HabitAPITestCase(APITestCase):
         response = self.client.get("/habits/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_habits_cursor_pages(self):
+        """Тестирование постраничного вывода списка привычек по курсору"""
+
+        for index in range(6):
+            Habit.objects.create(
+                user=self.user,
+                place=f"place_{index}",
+                time="00:00",
+                action="test_action",
+                time_to_complete=120,
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get("/habits/", {"page_size": 4})
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertNotIn("count", response.data)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNone(response.data["next"])
+
+    def test_public_habits_cache(self):
+        """Тестирование кэширования публичной ленты и её сброса при изменении привычки"""
+
+        cache.clear()
+        public_feed_cache.local.clear()
+        self.client.get("/habits/public/list/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/habits/public/list/")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertNotIn("next_fire_at", response.data["results"][0])
+
+        self.habit.is_published = False
+        self.habit.save()
+        response = self.client.get("/habits/public/list/")
+        self.assertEqual(len(response.data["results"]), 0)
+        self.assertEqual(
+            public_feed_cache.stats(), {"local_hits": 1, "shared_hits": 0, "misses": 2}
+        )
+
+    def test_get_habits_not_modified(self):
+        """Тестирование ответа 304 на повторный запрос списка без изменений"""
+
+        etag = self.client.get("/habits/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/habits/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.habit.place = "new_place"
+        self.habit.save()
+        response = self.client.get("/habits/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_habit_not_modified(self):
+        """Тестирование ответа 304 на повторный запрос привычки без изменений"""
+
+        etag = self.client.get(f"/habits/{self.habit.pk}/")["ETag"]
+        response = self.client.get(f"/habits/{self.habit.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_tick_changes_etags(self):
+        """Тестирование смены ETag списка и привычки после сдвига расписания тиком рассылки"""
+
+        self.habit.refresh_from_db()
+        self.habit.schedule()
+        self.habit.save()
+        list_etag = self.client.get("/habits/")["ETag"]
+        detail = self.client.get(f"/habits/{self.habit.pk}/")
+        schedule_due_deliveries(self.habit.next_fire_at + timedelta(minutes=1))
+        response = self.client.get("/habits/", HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"/habits/{self.habit.pk}/", HTTP_IF_NONE_MATCH=detail["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data["next_fire_at"], detail.data["next_fire_at"])
+
+    def test_related_habit_change_resets_referencing_list(self):
+        """Тестирование смены ETag списка с ?expand=related_habit после правки чужой связанной привычки"""
+
+        other = User.objects.create(email="other@example.com")
+        pleasant = Habit.objects.create(
+            user=other, place="p", time="00:00", action="a", pleasant_habit=True, time_to_complete=60
+        )
+        Habit.objects.filter(pk=self.habit.pk).update(related_habit=pleasant, reward=None)
+        etag = self.client.get("/habits/", {"expand": "related_habit"})["ETag"]
+        pleasant.action = "new_action"
+        pleasant.save()
+        response = self.client.get("/habits/", {"expand": "related_habit"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_endpoint(self):
+        """Тестирование учёта задержки и SQL-запросов в /metrics"""
+
+        registry.values.clear()
+        self.client.get("/habits/")
+        response = self.client.get("/metrics/")
+        body = response.content.decode()
+        self.assertIn('http_requests_total{view="habits:habits-list",status="200"} 1', body)
+        self.assertIn('http_request_sql_queries_total{view="habits:habits-list"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="habits:habits-list",le="+Inf"} 1', body)
+        bounds = re.findall(r'http_request_duration_seconds_bucket\{view="habits:habits-list",le="([^"]+)"\}', body)
+        self.assertEqual(bounds[-1], "+Inf")
+        self.assertEqual([float(bound) for bound in bounds], sorted(float(bound) for bound in bounds))
+
+        response = self.client.get("/metrics/", REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_detail_habit(self):
         """Тестирование получения детальной информации о привычке"""
         response = self.client.get(f"/habits/{self.habit.pk}/")
@@ -60,3 +231,1198 @@ class HabitAPITestCase(APITestCase):
 
         response = self.client.delete(f"/habits/{self.habit.pk}/delete/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class HabitBulkAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = Habit.objects.create(
+            user=self.user,
+            place="test_place",
+            time="00:00",
+            action="pleasant_action",
+            time_to_complete=60,
+        )
+        other_user = User.objects.create(email="other@example.com")
+        self.foreign = Habit.objects.create(
+            user=other_user,
+            place="test_place",
+            time="00:00",
+            action="foreign_action",
+            time_to_complete=60,
+        )
+
+    def test_bulk_create_habits(self):
+        """Тестирование пакетного создания привычек"""
+
+        data = [
+            {
+                "place": "test_place",
+                "time": "08:00",
+                "action": f"action_{index}",
+                "pleasant_habit": False,
+                "related_habit": self.pleasant.pk,
+                "time_to_complete": 60,
+            }
+            for index in range(3)
+        ]
+        response = self.client.post("/habits/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(
+            Habit.objects.filter(user=self.user, related_habit=self.pleasant).count(), 3
+        )
+        self.assertTrue(all(item["next_fire_at"] for item in response.data))
+
+    def test_bulk_create_returns_item_errors(self):
+        """Тестирование ошибок по элементам пакета и отката всего пакета"""
+
+        data = [
+            {"place": "test_place", "time": "08:00", "action": "ok", "time_to_complete": 60},
+            {"place": "test_place", "time": "08:00", "action": "slow", "time_to_complete": 500},
+            {
+                "place": "test_place",
+                "time": "08:00",
+                "action": "foreign",
+                "pleasant_habit": False,
+                "related_habit": self.foreign.pk,
+                "time_to_complete": 60,
+            },
+        ]
+        response = self.client.post("/habits/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("non_field_errors", response.data[1])
+        self.assertIn("related_habit", response.data[2])
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 1)
+
+    def test_list_expand_related_habit_and_user(self):
+        """Тестирование развёртывания связанной привычки и пользователя без лишних запросов"""
+
+        for index in range(4):
+            Habit.objects.create(
+                user=self.user,
+                place="test_place",
+                time="08:00",
+                action=f"action_{index}",
+                pleasant_habit=False,
+                related_habit=self.pleasant,
+                time_to_complete=60,
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/habits/", {"expand": "related_habit,user", "page_size": 10}
+            )
+        useful = [item for item in response.data["results"] if item["related_habit"]]
+        self.assertEqual(len(useful), 4)
+        self.assertEqual(useful[0]["related_habit"]["action"], "pleasant_action")
+        self.assertEqual(useful[0]["user"]["id"], self.user.pk)
+        self.assertNotIn("email", useful[0]["user"])
+
+    def test_public_feed_does_not_leak_private_expansions(self):
+        """Тестирование того, что кэш ленты после запроса владельца не раскрывает его данные анониму"""
+
+        cache.clear()
+        public_feed_cache.local.clear()
+        self.pleasant.action = "secret_action"
+        self.pleasant.is_published = False
+        self.pleasant.save()
+        public = Habit.objects.create(
+            user=self.user,
+            place="test_place",
+            time="08:00",
+            action="public_action",
+            pleasant_habit=False,
+            related_habit=self.pleasant,
+            time_to_complete=60,
+            is_published=True,
+        )
+        params = {"expand": "related_habit,user"}
+        owner_page = self.client.get("/habits/public/list/", params).json()
+        self.client.force_authenticate(user=None)
+        anonymous_page = self.client.get("/habits/public/list/", params).json()
+        self.assertEqual(anonymous_page, owner_page)
+        item = next(item for item in anonymous_page["results"] if item["id"] == public.pk)
+        self.assertEqual(item["related_habit"], self.pleasant.pk)
+        self.assertEqual(item["user"], self.user.pk)
+        self.assertNotIn("secret_action", json.dumps(anonymous_page))
+
+    def test_bulk_update_and_delete_habits(self):
+        """Тестирование пакетного изменения и удаления привычек"""
+
+        data = [{"id": self.pleasant.pk, "place": "new_place"}]
+        response = self.client.patch("/habits/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.pleasant.refresh_from_db()
+        self.assertEqual(self.pleasant.place, "new_place")
+
+        data = {"ids": [self.pleasant.pk, self.foreign.pk]}
+        response = self.client.delete("/habits/bulk/", data=data, format="json")
+        self.assertEqual(response.data["deleted"], [self.pleasant.pk])
+        self.assertIn(self.foreign.pk, response.data["errors"])
+        self.assertTrue(Habit.objects.filter(pk=self.foreign.pk).exists())
+
+    def test_bulk_rejects_malformed_items(self):
+        """Тестирование ошибок по элементам вместо 500 и строковых id при пакетном изменении"""
+
+        response = self.client.patch("/habits/bulk/", data=[1, 2], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), 2)
+        self.assertIn("non_field_errors", response.data[0])
+
+        data = [{"id": str(self.pleasant.pk), "place": "new_place"}]
+        response = self.client.patch("/habits/bulk/", data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.pleasant.refresh_from_db()
+        self.assertEqual(self.pleasant.place, "new_place")
+
+        response = self.client.delete("/habits/bulk/", data={"ids": [True]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_publishes_each_removal_once(self):
+        """Тестирование одного сообщения планировщику на каждую удалённую привычку"""
+
+        with patch("habits.signals.schedule_feed") as feed, self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/habits/bulk/", data={"ids": [self.pleasant.pk]}, format="json")
+        feed.publish.assert_called_once_with([(self.pleasant.pk, None)])
+
+
+class BulkImportCommandTestCase(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_import_users_and_habits(self):
+        """Тестирование потокового импорта с проверкой строк и контрольной точкой"""
+
+        users = self.directory / "users.csv"
+        users.write_text(
+            "email,first_name,password,password_hash\n"
+            "first@example.com,First,secret,\n"
+            "second@example.com,,,\n"
+            "first@example.com,Duplicate,,\n"
+            "not-an-email,Broken,,\n"
+            f"third@example.com,Third,,{make_password('hashed')}\n"
+            "fourth@example.com,Fourth,,plain-text\n"
+        )
+        errors = StringIO()
+        call_command("bulk_import", "users", str(users), batch_size=2, stdout=StringIO(), stderr=errors)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(User.objects.get(email="first@example.com").check_password("secret"))
+        self.assertFalse(User.objects.get(email="second@example.com").has_usable_password())
+        self.assertTrue(User.objects.get(email="third@example.com").check_password("hashed"))
+        self.assertIn("Строка 3", errors.getvalue())
+        self.assertIn("Строка 4", errors.getvalue())
+        self.assertIn("Строка 6", errors.getvalue())
+        self.assertEqual(ImportCheckpoint.objects.get(name=f"users:{users.resolve()}").processed, 6)
+
+        user = User.objects.get(email="second@example.com")
+        habits = self.directory / "habits.jsonl"
+        rows = [
+            {"user": user.pk, "place": "home", "time": "07:30", "action": "run", "time_to_complete": 60},
+            {"user": user.pk, "place": "home", "time": "07:30", "action": "slow", "time_to_complete": 600},
+        ]
+        habits.write_text("".join(json.dumps(row) + "\n" for row in rows))
+        version = get_version(user_habits_version_key(user.pk))
+        with patch("habits.management.commands.bulk_import.schedule_feed") as feed:
+            call_command("bulk_import", "habits", str(habits), stdout=StringIO(), stderr=StringIO())
+        habit = Habit.objects.get(user=user)
+        self.assertEqual(habit.action, "run")
+        self.assertIsNotNone(habit.next_fire_at)
+        # Импорт обходит сигналы, поэтому сам сбрасывает версии владельцев и сообщает планировщику
+        self.assertNotEqual(get_version(user_habits_version_key(user.pk)), version)
+        feed.publish.assert_called_once_with([(habit.pk, habit.next_fire_at)])
+
+        call_command("bulk_import", "habits", str(habits), resume=True, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Habit.objects.filter(user=user).count(), 1)
+
+    def test_checkpoint_commits_with_batch(self):
+        """Тестирование продолжения импорта после сбоя: записанный пакет не повторяется"""
+
+        users = self.directory / "users.jsonl"
+        users.write_text("".join(json.dumps({"email": f"user_{index}@example.com"}) + "\n" for index in range(5)))
+        write = BulkImportCommand.write
+        calls = []
+
+        def failing_write(command, objs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise RuntimeError("Сбой посреди импорта")
+            write(command, objs)
+
+        with patch.object(BulkImportCommand, "write", failing_write), self.assertRaises(RuntimeError):
+            call_command("bulk_import", "users", str(users), batch_size=2, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().processed, 2)
+
+        call_command("bulk_import", "users", str(users), batch_size=2, resume=True, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.get().processed, 5)
+
+    def test_copy_objects_rows(self):
+        """Тестирование строк COPY: заранее выданный первичный ключ и NULL как \\N"""
+
+        user = User(email="copy@example.com", first_name="Имя, с запятой")
+        cursor = Mock()
+        cursor.fetchall.return_value = [(7,)]
+        with patch.object(connection, "cursor") as make_cursor:
+            make_cursor.return_value.__enter__.return_value = cursor
+            copy_objects(User, [user])
+        self.assertEqual(user.pk, 7)
+        statement, buffer = cursor.copy_expert.call_args.args
+        columns = [field.column for field in User._meta.concrete_fields]
+        self.assertIn(f"({', '.join(connection.ops.quote_name(column) for column in columns)})", statement)
+        row = next(csv.reader(buffer))
+        self.assertEqual(len(row), len(columns))
+        self.assertEqual(row[columns.index("first_name")], "Имя, с запятой")
+        self.assertEqual(row[columns.index("id")], "7")
+        self.assertEqual(row[columns.index("last_login")], "\\N")
+
+    @skipUnless(connection.vendor == "postgresql", "COPY доступен только на PostgreSQL")
+    def test_import_through_copy(self):
+        """Тестирование импорта через COPY на PostgreSQL"""
+
+        user = User.objects.create(email="owner@example.com")
+        habits = self.directory / "habits.csv"
+        habits.write_text(
+            "user,place,time,action,time_to_complete\n"
+            f"{user.pk},home,07:30,run,60\n"
+            f"{user.pk},home,08:00,read,30\n"
+        )
+        call_command("bulk_import", "habits", str(habits), stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            sorted(Habit.objects.filter(user=user).values_list("action", flat=True)), ["read", "run"]
+        )
+        self.assertTrue(all(Habit.objects.filter(user=user).values_list("next_fire_at", flat=True)))
+
+
+class HabitExportAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        self.client.force_authenticate(user=self.user)
+        for index in range(3):
+            Habit.objects.create(
+                user=self.user,
+                place=f"place_{index}",
+                time="07:00",
+                action="test_action",
+                time_to_complete=60,
+            )
+        other_user = User.objects.create(email="other@example.com")
+        Habit.objects.create(
+            user=other_user, place="other", time="07:00", action="other", time_to_complete=60
+        )
+
+    def test_stream_csv_and_jsonl(self):
+        """Тестирование потоковой выгрузки только своих привычек"""
+
+        response = self.client.get("/habits/export/csv/")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "user_id", "place"])
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get("/habits/export/jsonl/")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["place"] for row in rows], ["place_0", "place_1", "place_2"])
+
+    def test_background_export_job(self):
+        """Тестирование фоновой выгрузки в файл и её скачивания"""
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post("/habits/export/jsonl/")
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data["status"], "done")
+            response = self.client.get(f"/habits/export/jobs/{response.data['id']}/download/")
+            self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 3)
+            response.close()
+
+    def test_download_missing_file(self):
+        """Тестирование 404 на скачивание выгрузки, файла которой нет в хранилище"""
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            export = HabitExport.objects.create(
+                user=self.user, file_format="csv", status=HabitExport.DONE, file="exports/missing.csv"
+            )
+            response = self.client.get(f"/habits/export/jobs/{export.pk}/download/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_parquet_rejected_without_pyarrow(self):
+        """Тестирование отказа в выгрузке Parquet, если pyarrow не установлен"""
+
+        with patch("habits.views.parquet_available", return_value=False):
+            response = self.client.post("/habits/export/parquet/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(HabitExport.objects.exists())
+
+    def test_unexpected_export_error_marks_job_failed(self):
+        """Тестирование статуса выгрузки после непредвиденной ошибки"""
+
+        export = HabitExport.objects.create(user=self.user, file_format="csv")
+        with patch("habits.tasks.write_export", side_effect=OSError("Нет места на диске")):
+            with self.assertRaises(OSError):
+                export_habits(export.pk)
+        export.refresh_from_db()
+        self.assertEqual(export.status, HabitExport.FAILED)
+        self.assertIsNotNone(export.finished_at)
+
+
+class HabitScheduleTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", tg_chat_id="42")
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_sets_next_fire_at(self):
+        """Тестирование расчёта ближайшего напоминания при создании привычки"""
+
+        data = {
+            "place": "test_place",
+            "time": "10:00",
+            "action": "test_action",
+            "reward": "reward",
+            "time_to_complete": 120,
+        }
+        response = self.client.post("/habits/create/", data=data)
+        habit = Habit.objects.get(pk=response.data["id"])
+        self.assertGreaterEqual(habit.next_fire_at, timezone.now())
+        self.assertEqual(timezone.localtime(habit.next_fire_at).time(), time(10, 0))
+
+    def test_following_fire_at_honors_periodicity(self):
+        """Тестирование сдвига напоминания на период привычки"""
+
+        now = timezone.now()
+        fire_at = get_next_fire_at(time(10, 0), now)
+        self.assertEqual(
+            get_following_fire_at(fire_at, 3, now), fire_at + timedelta(days=3)
+        )
+        overdue = fire_at - timedelta(days=10)
+        self.assertGreater(get_following_fire_at(overdue, 3, now), now)
+
+    @patch("habits.tasks.send_telegram_messages")
+    def test_notification_sends_due_habits(self, send_mock):
+        """Тестирование отправки напоминаний только по наступившим привычкам"""
+
+        now = timezone.now()
+        due = Habit.objects.create(
+            user=self.user,
+            place="test_place",
+            time="00:00",
+            action="test_action",
+            time_to_complete=120,
+            periodicity=2,
+            next_fire_at=now - timedelta(minutes=1),
+        )
+        Habit.objects.create(
+            user=self.user,
+            place="test_place",
+            time="00:00",
+            action="test_action",
+            time_to_complete=120,
+            next_fire_at=now + timedelta(hours=1),
+        )
+        send_mock.return_value = [TelegramResult("42", True, 200)]
+        with patch(
+            "habits.tasks.aggregate_reminder_results.run",
+            wraps=aggregate_reminder_results.run,
+        ) as aggregate_mock:
+            self.assertEqual(telegram_notification(), 1)
+        aggregate_mock.assert_called_once()
+        self.assertEqual(
+            list(send_mock.call_args.args[0]),
+            [("42", "Я буду test_action в 00:00:00 в test_place")],
+        )
+        due.refresh_from_db()
+        self.assertGreater(due.next_fire_at, now + timedelta(days=1))
+        delivery = ReminderDelivery.objects.get(habit=due)
+        self.assertEqual(delivery.status, ReminderDelivery.SENT)
+
+        tick = ReminderTick.objects.get()
+        self.assertEqual((tick.habits_scanned, tick.attempted, tick.sent, tick.failed), (1, 1, 1, 0))
+        self.assertIsNotNone(tick.duration)
+        self.assertIsNotNone(tick.lag_max)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/habits/ops/stats/")
+        self.assertEqual(response.data["last_day"]["sent"], 1)
+        self.assertEqual(response.data["backlog"], 0)
+
+    @patch("habits.tasks.send_telegram_messages")
+    def test_notification_rerun_does_not_resend(self, send_mock):
+        """Тестирование однократной отправки каждого наступления привычки"""
+
+        habit = Habit.objects.create(
+            user=self.user,
+            place="test_place",
+            time="00:00",
+            action="test_action",
+            time_to_complete=120,
+            next_fire_at=timezone.now() - timedelta(minutes=1),
+        )
+        send_mock.side_effect = lambda messages: [
+            TelegramResult(chat_id, True, 200) for chat_id, _ in messages
+        ]
+        telegram_notification()
+        telegram_notification()
+        self.assertEqual(send_mock.call_count, 1)
+        self.assertEqual(ReminderDelivery.objects.filter(habit=habit).count(), 1)
+        self.assertEqual(ReminderDelivery.objects.backlog(), 0)
+        self.assertIsNotNone(ReminderDelivery.objects.send_latency(timezone.now() - timedelta(days=1))["avg"])
+        self.assertIsNone(ReminderDelivery.objects.send_latency(timezone.now())["avg"])
+
+    @patch("habits.tasks.send_telegram_messages")
+    def test_shed_results_skip_latency_histogram(self, send_mock):
+        """Тестирование гистограммы задержки только по сообщениям, ушедшим в Telegram"""
+
+        other = User.objects.create(email="other@example.com", tg_chat_id="43")
+        deliveries = [
+            ReminderDelivery.objects.create(
+                habit=Habit.objects.create(user=user, place="p", time="00:00", action="a", time_to_complete=120),
+                scheduled_at=timezone.now(),
+            )
+            for user in (self.user, other)
+        ]
+        send_mock.side_effect = lambda messages: [
+            TelegramResult("42", True, 200, latency=2.0),
+            TelegramResult("43", False, error="Telegram недоступен", shed=True),
+        ]
+        result = send_habit_reminders([delivery.pk for delivery in deliveries])
+        self.assertEqual(result["attempted"], 1)
+        self.assertEqual(sum(result["latency"]["counts"]), 1)
+        self.assertEqual(result["latency"]["sum"], 2.0)
+
+    @patch("habits.tasks.send_telegram_messages")
+    def test_failed_sends_are_deferred_or_dead_lettered(self, send_mock):
+        """Тестирование повтора временных сбоев и исключения недоставляемых чатов"""
+
+        blocked = User.objects.create(email="blocked@example.com", tg_chat_id="blocked")
+        for user in (self.user, blocked):
+            Habit.objects.create(
+                user=user, place="p", time="00:00", action="a", time_to_complete=120,
+                next_fire_at=timezone.now() - timedelta(minutes=1),
+            )
+        send_mock.side_effect = lambda messages: [
+            TelegramResult(chat_id, False, 403, "blocked", permanent=True)
+            if chat_id == "blocked"
+            else TelegramResult(chat_id, False, 502, "Bad Gateway")
+            for chat_id, _ in messages
+        ]
+        telegram_notification()
+        self.assertTrue(TelegramDeadLetter.objects.filter(chat_id="blocked").exists())
+        self.assertEqual(ReminderDelivery.objects.get(habit__user=blocked).status, ReminderDelivery.FAILED)
+        deferred = ReminderDelivery.objects.get(habit__user=self.user)
+        self.assertEqual((deferred.status, deferred.attempts), (ReminderDelivery.PENDING, 1))
+
+        sent_chats = []
+
+        def send(messages):
+            sent_chats.extend(chat_id for chat_id, _ in messages)
+            return [TelegramResult(chat_id, True, 200) for chat_id in sent_chats]
+
+        send_mock.side_effect = send
+        telegram_notification()
+        self.assertEqual(sent_chats, ["42"])
+        self.assertEqual(ReminderDelivery.objects.get(habit__user=self.user).status, ReminderDelivery.SENT)
+
+    @patch("habits.tasks.send_telegram_messages")
+    def test_stale_sending_deliveries_are_reclaimed(self, send_mock):
+        """Тестирование возврата в очередь записей, брошенных упавшим воркером"""
+
+        now = timezone.now()
+        habits = [
+            Habit.objects.create(
+                user=self.user, place="p", time="00:00", action=action, time_to_complete=120
+            )
+            for action in ("stale", "fresh")
+        ]
+        stale, fresh = (
+            ReminderDelivery.objects.create(
+                habit=habit,
+                scheduled_at=now - timedelta(minutes=1),
+                status=ReminderDelivery.SENDING,
+                claimed_at=claimed_at,
+            )
+            for habit, claimed_at in zip(habits, (now - timedelta(hours=1), now))
+        )
+        sent_texts = []
+
+        def send(messages):
+            messages = list(messages)
+            sent_texts.extend(text for _, text in messages)
+            return [TelegramResult(chat_id, True, 200) for chat_id, _ in messages]
+
+        send_mock.side_effect = send
+        telegram_notification()
+        self.assertEqual(sent_texts, ["Я буду stale в 00:00:00 в p"])
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts), (ReminderDelivery.SENT, 1))
+        self.assertEqual(fresh.status, ReminderDelivery.SENDING)
+
+    def test_prune_reminder_deliveries(self):
+        """Тестирование удаления старых завершённых записей журнала"""
+
+        habit = Habit.objects.create(user=self.user, place="p", time="00:00", action="a", time_to_complete=120)
+        old = timezone.now() - settings.REMINDER_DELIVERY_RETENTION - timedelta(days=1)
+        for index, delivery_status in enumerate(
+            (ReminderDelivery.SENT, ReminderDelivery.FAILED, ReminderDelivery.PENDING)
+        ):
+            ReminderDelivery.objects.create(
+                habit=habit, scheduled_at=old + timedelta(minutes=index), status=delivery_status
+            )
+        recent = ReminderDelivery.objects.create(
+            habit=habit, scheduled_at=timezone.now(), status=ReminderDelivery.SENT
+        )
+        self.assertEqual(prune_reminder_deliveries(batch_size=1), 2)
+        self.assertEqual(
+            set(ReminderDelivery.objects.values_list("status", flat=True)),
+            {ReminderDelivery.PENDING, ReminderDelivery.SENT},
+        )
+        self.assertTrue(ReminderDelivery.objects.filter(pk=recent.pk).exists())
+
+    def test_partition_keeps_user_in_one_shard(self):
+        """Тестирование разбиения привычек по шардам и порциям"""
+
+        deliveries = [(pk, pk % 6) for pk in range(1, 13)] + [(pk, 7) for pk in range(100, 105)]
+        users = dict(deliveries)
+        chunks = partition_by_user(deliveries, shard_count=2, chunk_size=4)
+        self.assertEqual(sorted(pk for chunk in chunks for pk in chunk), sorted(users))
+        for chunk in chunks:
+            self.assertEqual(len({users[pk] % 2 for pk in chunk}), 1)
+            self.assertTrue(len(chunk) <= 4 or len({users[pk] for pk in chunk}) == 1)
+        for user_id in set(users.values()):
+            self.assertEqual(sum(any(users[pk] == user_id for pk in chunk) for chunk in chunks), 1)
+
+    def test_rate_limit_is_shared_between_calls(self):
+        """Тестирование общего лимита частоты: лишний запрос ждёт следующей секунды"""
+
+        cache.clear()
+        limiter = SharedRateLimiter("test")
+        started = int(timezone.now().timestamp())
+        for _ in range(3):
+            limiter.acquire(2)
+        self.assertGreater(int(timezone.now().timestamp()), started)
+
+
+class UserTimezoneScheduleTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", timezone="Europe/Moscow")
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_uses_user_timezone(self):
+        """Тестирование расчёта напоминания по местному времени пользователя"""
+
+        data = {"place": "p", "time": "10:00", "action": "a", "reward": "r", "time_to_complete": 60}
+        response = self.client.post("/habits/create/", data=data)
+        habit = Habit.objects.get(pk=response.data["id"])
+        self.assertEqual(timezone.localtime(habit.next_fire_at, self.user.zoneinfo).time(), time(10, 0))
+        self.assertEqual(habit.utc_minute, 7 * 60)
+
+    def test_following_fire_at_keeps_local_time_over_dst(self):
+        """Тестирование сохранения местного времени при переходе на летнее время"""
+
+        tz = ZoneInfo("America/New_York")
+        fire_at = datetime(2026, 3, 7, 9, 0, tzinfo=tz)
+        following = get_following_fire_at(fire_at, 1, fire_at, time(9, 0), tz)
+        self.assertEqual(following, datetime(2026, 3, 8, 9, 0, tzinfo=tz))
+        utc = ZoneInfo("UTC")
+        self.assertEqual(following.astimezone(utc) - fire_at.astimezone(utc), timedelta(hours=23))
+        self.assertEqual(get_utc_minute(fire_at) - get_utc_minute(following), 60)
+
+    def test_timezone_change_reschedules_habits(self):
+        """Тестирование пересчёта напоминаний при смене часового пояса"""
+
+        response = self.client.post(
+            "/habits/create/",
+            data={"place": "p", "time": "10:00", "action": "a", "reward": "r", "time_to_complete": 60},
+        )
+        user = User.objects.get(pk=self.user.pk)
+        user.timezone = "Asia/Tokyo"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        habit = Habit.objects.get(pk=response.data["id"])
+        self.assertEqual(habit.utc_minute, 1 * 60)
+        self.assertEqual(timezone.localtime(habit.next_fire_at, user.zoneinfo).time(), time(10, 0))
+        self.assertTrue(ReminderLoadBucket.objects.filter(minute=60, count=1).exists())
+
+    def test_recompute_fire_times_near_dst(self):
+        """Тестирование периодической сверки расписания для поясов с переходом на летнее время"""
+
+        now = datetime(2026, 3, 5, 12, 0, tzinfo=ZoneInfo("UTC"))
+        user = User.objects.create(email="ny@example.com", timezone="America/New_York")
+        self.assertEqual(get_shifting_timezones(now, timedelta(days=8)), ["America/New_York"])
+        # Смещение посчитано по зимнему времени для даты после перехода
+        stale = datetime(2026, 3, 9, 14, 0, tzinfo=ZoneInfo("UTC"))
+        habit = Habit.objects.create(
+            user=user, place="p", time=time(9, 0), action="a", reward="r", time_to_complete=60,
+            next_fire_at=stale, utc_minute=get_utc_minute(stale),
+        )
+        with patch("django.utils.timezone.now", return_value=now):
+            self.assertEqual(recompute_fire_times(), 1)
+        habit.refresh_from_db()
+        self.assertEqual(habit.next_fire_at, datetime(2026, 3, 9, 13, 0, tzinfo=ZoneInfo("UTC")))
+        self.assertEqual(habit.utc_minute, 13 * 60)
+
+
+class ReminderSchedulerTestCase(APITestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        user = User.objects.create(email="test@example.com")
+        self.habits = [
+            Habit.objects.create(
+                user=user, place="p", time="10:00", action="a", reward="r", time_to_complete=60,
+                next_fire_at=self.now + offset,
+            )
+            for offset in (timedelta(minutes=-1), timedelta(minutes=10), timedelta(hours=2))
+        ]
+
+    def make_scheduler(self, max_entries=100):
+        return ReminderScheduler(
+            dispatch=lambda now: None, horizon=3600, max_entries=max_entries, refresh_interval=300
+        )
+
+    def test_window_and_change_feed(self):
+        """Тестирование окна ближайших наступлений и применения изменений из ленты"""
+
+        overdue, soon, later = self.habits
+        scheduler = self.make_scheduler()
+        self.assertEqual(scheduler.load(self.now.timestamp()), 2)
+        self.assertEqual(scheduler.pop_due(self.now.timestamp()), [overdue.pk])
+
+        moved = (self.now + timedelta(minutes=5)).timestamp()
+        scheduler.apply([(later.pk, moved), (soon.pk, None), (overdue.pk, (self.now + timedelta(days=1)).timestamp())])
+        self.assertEqual(scheduler.next_due(), moved)
+        self.assertEqual(scheduler.pop_due(self.now.timestamp() + 3600), [later.pk])
+        self.assertIsNone(scheduler.next_due())
+
+        scheduler = self.make_scheduler(max_entries=1)
+        scheduler.load(self.now.timestamp())
+        self.assertEqual(scheduler.window_end, overdue.next_fire_at.timestamp())
+
+    def test_changes_during_reload_survive(self):
+        """Тестирование изменений из ленты, пришедших во время перечитывания окна"""
+
+        overdue, soon, later = self.habits
+        scheduler = self.make_scheduler()
+        read_window = scheduler.read_window
+        moved = (self.now + timedelta(minutes=5)).timestamp()
+
+        def slow_read_window(now):
+            rows = read_window(now)
+            # Снимок уже прочитан, а слушатель ленты успевает применить изменение
+            scheduler.apply([(later.pk, moved), (soon.pk, None)])
+            return rows
+
+        scheduler.read_window = slow_read_window
+        self.assertEqual(async_to_sync(scheduler.reload)(self.now.timestamp()), 2)
+        self.assertIsNone(scheduler.buffered)
+        self.assertEqual(scheduler.entries, {overdue.pk: overdue.next_fire_at.timestamp(), later.pk: moved})
+
+    def test_dispatch_returns_new_schedule(self):
+        """Тестирование отправки наступивших и возврата их следующего напоминания"""
+
+        overdue = self.habits[0]
+        scheduler = self.make_scheduler()
+        scheduler.dispatch = lambda now: Habit.objects.filter(pk=overdue.pk).update(
+            next_fire_at=now + timedelta(days=1)
+        )
+        [(pk, timestamp)] = scheduler.dispatch_due([overdue.pk])
+        self.assertEqual(pk, overdue.pk)
+        self.assertGreater(timestamp, self.now.timestamp() + 3600)
+
+    def test_habit_changes_published(self):
+        """Тестирование публикации изменений расписания после фиксации транзакции"""
+
+        feed = ScheduleFeed()
+        feed.client = Mock()
+        habit = self.habits[1]
+        pk = habit.pk
+        with patch("habits.signals.schedule_feed", feed), self.captureOnCommitCallbacks(execute=True):
+            habit.delete()
+        channel, payload = feed.client.publish.call_args.args
+        self.assertEqual(decode_changes(payload), [(pk, None)])
+
+
+class HabitCompletionTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            user=self.user, place="p", time="08:00", action="a", reward="r", time_to_complete=60, periodicity=2
+        )
+
+    def test_complete_habit_updates_counters(self):
+        """Тестирование инкрементальных счётчиков серии с учётом периодичности"""
+
+        now = timezone.now()
+        response = self.client.post(f"/habits/{self.habit.pk}/completions/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["streak"], 1)
+        response = self.client.post(f"/habits/{self.habit.pk}/completions/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["completed_periods"], 1)
+
+        complete_habit(self.habit.pk, now - timedelta(days=2))
+        complete_habit(self.habit.pk, now - timedelta(days=10))
+        habit = Habit.objects.get(pk=self.habit.pk)
+        self.assertEqual(habit.completed_periods, 3)
+        self.assertEqual(habit.streak, 1)
+        self.assertEqual(habit.get_current_streak(now), 1)
+        self.assertEqual(habit.get_current_streak(now + timedelta(days=6)), 0)
+        self.assertEqual(habit.get_completion_rate(now), 0.5)
+
+        response = self.client.get(f"/habits/{self.habit.pk}/completions/")
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertGreater(response.data["results"][0]["period"], response.data["results"][1]["period"])
+
+    def test_consecutive_periods_extend_streak(self):
+        """Тестирование продления серии выполнением в соседнем периоде"""
+
+        now = timezone.now()
+        complete_habit(self.habit.pk, now - timedelta(days=2))
+        habit, _, created = complete_habit(self.habit.pk, now)
+        self.assertTrue(created)
+        self.assertEqual(habit.streak, 2)
+
+    def test_periods_start_on_reminder_days(self):
+        """Тестирование границ периодов по дням напоминаний привычки"""
+
+        fire_at = datetime(2026, 3, 10, 8, 0, tzinfo=ZoneInfo("UTC"))
+        habit = Habit(periodicity=3, next_fire_at=fire_at)
+        day = timedelta(days=1)
+        self.assertEqual(habit.get_period_index(fire_at) - habit.get_period_index(fire_at - day), 1)
+        self.assertEqual(habit.get_period_index(fire_at + 2 * day), habit.get_period_index(fire_at))
+        self.assertEqual(habit.get_period_index(fire_at + 3 * day) - habit.get_period_index(fire_at), 1)
+        self.assertEqual(habit.get_period_index(fire_at - 3 * day) - habit.get_period_index(fire_at), -1)
+
+    def test_periods_follow_owner_timezone(self):
+        """Тестирование отметок около местной полуночи у владельца не в UTC"""
+
+        self.user.timezone = "Asia/Vladivostok"
+        self.user.save()
+        self.habit.refresh_from_db()
+        self.habit.periodicity = 1
+        self.habit.schedule(after=datetime(2026, 3, 9, 12, 0, tzinfo=ZoneInfo("UTC")))
+        self.habit.save()
+        vladivostok = ZoneInfo("Asia/Vladivostok")
+        # 23:30 и 00:30 по Владивостоку — это 13:30 и 14:30 одних и тех же суток по UTC
+        complete_habit(self.habit.pk, datetime(2026, 3, 9, 23, 30, tzinfo=vladivostok))
+        habit, _, created = complete_habit(self.habit.pk, datetime(2026, 3, 10, 0, 30, tzinfo=vladivostok))
+        self.assertTrue(created)
+        self.assertEqual(habit.streak, 2)
+        _, _, created = complete_habit(self.habit.pk, datetime(2026, 3, 10, 23, 59, tzinfo=vladivostok))
+        self.assertFalse(created)
+        now = datetime(2026, 3, 11, 23, 59, tzinfo=vladivostok)
+        self.assertEqual(habit.get_current_streak(now), 2)
+        self.assertEqual(habit.get_current_streak(now + timedelta(minutes=2)), 0)
+        self.assertEqual(habit.get_completion_rate(now), 2 / 3)
+
+    def test_completion_keeps_public_feed_and_schedule(self):
+        """Тестирование отметки без сброса кэша ленты и без сообщения планировщику"""
+
+        self.habit.is_published = True
+        self.habit.save()
+        response = self.client.get("/habits/public/list/")
+        self.assertNotIn("streak", response.data["results"][0])
+        feed_version = get_version(PUBLIC_FEED_VERSION_KEY)
+        habit_version = get_version(habit_version_key(self.habit.pk))
+        with patch("habits.signals.schedule_feed") as feed, self.captureOnCommitCallbacks(execute=True):
+            complete_habit(self.habit.pk)
+        feed.publish.assert_not_called()
+        self.assertEqual(get_version(PUBLIC_FEED_VERSION_KEY), feed_version)
+        self.assertNotEqual(get_version(habit_version_key(self.habit.pk)), habit_version)
+        response = self.client.get(f"/habits/{self.habit.pk}/")
+        self.assertEqual(response.data["streak"], 1)
+
+    def test_reschedule_renumbers_periods(self):
+        """Тестирование перенумерации отметок после сдвига дней напоминаний"""
+
+        fire_at = datetime(2026, 3, 10, 8, 0, tzinfo=ZoneInfo("UTC"))
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=fire_at)
+        complete_habit(self.habit.pk, fire_at - timedelta(days=1))
+        habit, _, _ = complete_habit(self.habit.pk, fire_at)
+        self.assertEqual(habit.streak, 2)
+
+        # Сдвиг на сутки при периодичности 2 сводит обе отметки в один период
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=fire_at + timedelta(days=1))
+        [habit] = renumber_completions([self.habit.pk])
+        self.assertEqual((habit.streak, habit.completed_periods), (1, 1))
+        [completion] = habit.completions.all()
+        self.assertEqual(completion.completed_at, fire_at - timedelta(days=1))
+        self.assertEqual(completion.period, habit.get_period_index(completion.completed_at))
+        self.assertEqual(renumber_completions([self.habit.pk]), [])
+
+    def test_time_edit_keeps_periods_consistent(self):
+        """Тестирование номеров периодов после смены времени привычки через API"""
+
+        now = timezone.now()
+        complete_habit(self.habit.pk, now - timedelta(days=3))
+        complete_habit(self.habit.pk, now)
+        response = self.client.patch(f"/habits/{self.habit.pk}/update/", data={"time": "23:59"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habit = Habit.objects.select_related("user").get(pk=self.habit.pk)
+        for completion in habit.completions.all():
+            self.assertEqual(completion.period, habit.get_period_index(completion.completed_at))
+        self.assertEqual(response.data["completed_periods"], habit.completed_periods)
+
+    def test_completion_requires_owner(self):
+        """Тестирование запрета отмечать чужую привычку"""
+
+        self.client.force_authenticate(user=User.objects.create(email="other@example.com"))
+        response = self.client.post(f"/habits/{self.habit.pk}/completions/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(self.habit.completions.exists())
+
+
+class ReminderLoadTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="admin@example.com", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            user=self.user, place="p", time=time(9, 30), action="a", reward="r", time_to_complete=60,
+            **get_schedule(time(9, 30)),
+        )
+        # 12:30 по Москве (UTC+3) попадает в ту же минуту по UTC
+        moscow = User.objects.create(email="moscow@example.com", timezone="Europe/Moscow")
+        Habit.objects.create(
+            user=moscow, place="p", time=time(12, 30), action="b", reward="r", time_to_complete=60, periodicity=2,
+            **get_schedule(time(12, 30), moscow.zoneinfo),
+        )
+
+    def test_signals_keep_buckets_in_sync(self):
+        """Тестирование инкрементального обновления корзин при изменении и удалении привычек"""
+
+        self.habit.time = time(18, 0)
+        self.habit.schedule()
+        self.habit.save()
+        self.habit.periodicity = 7
+        self.habit.save()
+        buckets = {(b.minute, b.periodicity): b.count for b in ReminderLoadBucket.objects.filter(count__gt=0)}
+        self.assertEqual(buckets, {(570, 2): 1, (1080, 7): 1})
+
+        Habit.objects.get(pk=self.habit.pk).delete()
+        self.assertFalse(ReminderLoadBucket.objects.filter(minute=1080, count__gt=0).exists())
+        self.assertEqual(rebuild_reminder_load(), 1)
+
+    def test_reminder_load_histogram(self):
+        """Тестирование гистограммы нагрузки по минутам и часам"""
+
+        load = get_reminder_load()
+        self.assertEqual(len(load["peak"]), 1440)
+        self.assertEqual(load["peak"][570], 2)
+        self.assertEqual(load["expected"][570], 1.5)
+        self.assertEqual(load["busiest_slot"], 570)
+
+        response = self.client.get("/habits/ops/reminder-load/", {"resolution": "hour"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["peak"]), 24)
+        self.assertEqual(response.data["peak"][9], 2)
+        self.assertEqual(response.data["telegram_limit_per_slot"], 30 * 3600)
+        response = self.client.get("/habits/ops/reminder-load/", {"resolution": "week"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TelegramBatchSenderTestCase(SimpleTestCase):
+
+    def test_send_batch_returns_per_message_results(self):
+        """Тестирование пакетной отправки с результатом по каждому сообщению"""
+
+        messages = [("1", "first"), ("bad", "second"), ("3", "third")]
+        with FakeTelegramServer() as server:
+            with override_settings(TELEGRAM_URL_BOT=server.base_url, TG_BOT_TOKEN="token"):
+                results = send_telegram_messages(messages, max_connections=2)
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual(results[1].status_code, 400)
+        self.assertFalse(results[1].permanent)
+        self.assertEqual(len(server.received), 3)
+
+    @override_settings(
+        TELEGRAM_MAX_RETRIES=2, TELEGRAM_RETRY_BACKOFF=0, TELEGRAM_CIRCUIT_THRESHOLD=100, TELEGRAM_CHAT_RATE_LIMIT=100
+    )
+    def test_retries_and_permanent_errors(self):
+        """Тестирование повторов с учётом retry_after и распознавания недоставляемых чатов"""
+
+        cache.clear()
+        messages = [("flaky", "first"), ("blocked", "second"), ("down", "third")]
+        with FakeTelegramServer() as server:
+            with override_settings(TELEGRAM_URL_BOT=server.base_url, TG_BOT_TOKEN="token"):
+                flaky, blocked, down = send_telegram_messages(messages)
+        self.assertTrue(flaky.ok)
+        self.assertEqual(flaky.attempts, 2)
+        self.assertTrue(blocked.permanent)
+        self.assertEqual(blocked.attempts, 1)
+        self.assertFalse(down.ok)
+        self.assertEqual(down.attempts, 3)
+
+    @override_settings(TELEGRAM_MAX_RETRIES=0, TELEGRAM_CIRCUIT_THRESHOLD=2, TELEGRAM_CHAT_RATE_LIMIT=100)
+    def test_circuit_breaker_sheds_load(self):
+        """Тестирование размыкания предохранителя после серии сбоев"""
+
+        cache.clear()
+        with FakeTelegramServer() as server:
+            with override_settings(TELEGRAM_URL_BOT=server.base_url, TG_BOT_TOKEN="token"):
+                results = send_telegram_messages([("down", "1"), ("down", "2"), ("1", "3")], max_connections=1)
+        self.assertTrue(telegram_circuit.is_open())
+        self.assertTrue(results[2].shed)
+        self.assertEqual(len(server.received), 2)
+        cache.clear()
+
+
+class AsyncReadViewsTestCase(APITestCase):
+    """Асинхронные представления чтения отвечают так же, как синхронные"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="async@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+        self.habits = [
+            Habit.objects.create(
+                user=self.user,
+                place=f"place_{index}",
+                time="08:00",
+                action="action",
+                time_to_complete=60,
+                is_published=index % 2 == 0,
+            )
+            for index in range(12)
+        ]
+
+    def async_get(self, view, path, params=None, headers=None, **kwargs):
+        request = AsyncRequestFactory().get(path, params, headers=headers)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def async_list(self, params=None):
+        response = self.async_get(HabitListAsyncView, "/habits/", params, headers={"Authorization": self.auth})
+        return json.loads(response.content)
+
+    def test_list_matches_sync_view(self):
+        """Тестирование совпадения страниц списка и переходов по курсорам"""
+
+        sync_page = self.client.get("/habits/").json()
+        self.assertEqual(self.async_list(), sync_page)
+        cursor = parse_qs(urlparse(sync_page["next"]).query)["cursor"][0]
+        sync_next = self.client.get("/habits/", {"cursor": cursor}).json()
+        self.assertEqual(self.async_list({"cursor": cursor}), sync_next)
+        cursor = parse_qs(urlparse(sync_next["previous"]).query)["cursor"][0]
+        self.assertEqual(self.async_list({"cursor": cursor}), sync_page)
+
+    def test_public_list_and_expand(self):
+        """Тестирование публичной ленты и развёртывания связей"""
+
+        self.habits[2].related_habit = self.habits[0]
+        self.habits[2].save()
+        params = {"expand": "related_habit,user"}
+        sync_page = self.client.get("/habits/public/list/", params).json()
+        cache.clear()
+        public_feed_cache.local.clear()
+        response = self.async_get(PublishedHabitListAsyncView, "/habits/public/list/", params=params)
+        self.assertEqual(json.loads(response.content), sync_page)
+        self.assertEqual(sync_page["results"][1]["related_habit"]["id"], self.habits[0].pk)
+        self.assertEqual(sync_page["results"][0]["user"], self.user.pk)
+
+    def test_retrieve_etag_and_errors(self):
+        """Тестирование просмотра привычки, 304 по ETag, 404 и 401"""
+
+        habit = self.habits[0]
+        path = f"/habits/{habit.pk}/"
+        response = self.async_get(
+            HabitRetrieveAsyncView, path, headers={"Authorization": self.auth}, pk=habit.pk
+        )
+        self.assertEqual(json.loads(response.content), self.client.get(path).json())
+        response = self.async_get(
+            HabitRetrieveAsyncView,
+            path,
+            headers={"Authorization": self.auth, "If-None-Match": response["ETag"]},
+            pk=habit.pk,
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.async_get(
+            HabitRetrieveAsyncView, "/habits/0/", headers={"Authorization": self.auth}, pk=0
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.async_get(HabitListAsyncView, "/habits/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_under_asgi(self):
+        """Тестирование учёта запросов middleware метрик под ASGI"""
+
+        registry.values.clear()
+        cache.clear()
+        public_feed_cache.local.clear()
+        response = async_to_sync(self.async_client.get)("/habits/public/list/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        values = registry.collect()
+        self.assertEqual(values['http_requests_total{view="habits:public-habits",status="200"}'], 1)
+        self.assertEqual(values['http_request_sql_queries_total{view="habits:public-habits"}'], 1)
+
+
+class OpenAPISchemaTestCase(APITestCase):
+    """Схема API отдаётся из готовых файлов и генерируется заново только при смене версии кода"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.enterContext(override_settings(OPENAPI_SCHEMA_DIR=self.directory.name, CODE_VERSION="v1"))
+        get_code_version.cache_clear()
+        self.addCleanup(get_code_version.cache_clear)
+        schema_artifacts.version = None
+
+    def test_schema_served_from_artifact(self):
+        """Тестирование отдачи схемы из файлов generate_openapi_schema без повторной генерации"""
+
+        call_command("generate_openapi_schema", stdout=StringIO())
+        schema = json.loads((Path(self.directory.name) / "schema.json").read_text())
+        self.assertIn("/habits/", schema["paths"])
+        with patch("config.openapi.OpenAPISchemaGenerator.get_schema") as get_schema:
+            response = self.client.get("/swagger.json/")
+            self.client.get("/swagger.yaml/")
+        get_schema.assert_not_called()
+        self.assertEqual(json.loads(response.content), schema)
+        self.assertEqual(response["ETag"], '"v1"')
+
+    def test_schema_covers_bulk_endpoint(self):
+        """Тестирование описания пакетного эндпоинта в схеме"""
+
+        schema = json.loads(render_schema()["json"])
+        bulk = schema["paths"]["/habits/bulk/"]
+        self.assertEqual({"post", "patch", "delete"} - set(bulk), set())
+        self.assertEqual(bulk["post"]["parameters"][0]["schema"]["type"], "array")
+
+    def test_schema_generation_covers_all_views(self):
+        """Тестирование генерации схемы без ошибок в представлениях"""
+
+        with self.assertNoLogs("drf_yasg", level="WARNING"):
+            schema = json.loads(render_schema()["json"])
+        self.assertIn("/habits/{id}/completions/", schema["paths"])
+
+    def test_schema_regenerated_on_new_version(self):
+        """Тестирование перегенерации схемы при смене версии кода"""
+
+        call_command("generate_openapi_schema", stdout=StringIO())
+        get_code_version.cache_clear()
+        with override_settings(CODE_VERSION="v2"):
+            response = self.client.get("/swagger.json/")
+            self.client.get("/swagger.json/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((Path(self.directory.name) / "version").read_text(), "v2")
+
+
+class StartupBudgetTestCase(SimpleTestCase):
+    """Холодный старт веб- и celery-процессов укладывается в бюджет и не грузит тяжёлые модули"""
+
+    def test_cold_import_within_budget(self):
+        for target in STARTUP_TARGETS:
+            with self.subTest(target=target):
+                result = measure_startup(target)
+                self.assertEqual(result["lazy_loaded"], [])
+                self.assertLess(result["seconds"], settings.STARTUP_IMPORT_BUDGET)
+
+
+class BenchmarkCommandsTestCase(APITestCase):
+
+    def test_seed_and_benchmarks_save_results(self):
+        """Тестирование генерации данных и сохранения результатов бенчмарков"""
+
+        call_command("seed_habits", users=4, habits_per_user=3, stdout=StringIO())
+        self.assertEqual(Habit.objects.filter(user__email__startswith="bench-").count(), 12)
+        with tempfile.TemporaryDirectory() as output:
+            call_command("bench_api", requests=4, concurrency=1, output=output, stdout=StringIO())
+            call_command("bench_reminders", habits=5, telegram_delay=0, output=output, stdout=StringIO())
+            reports = {path.name.split("-")[0]: json.loads(path.read_text()) for path in Path(output).iterdir()}
+        self.assertEqual(reports["api"]["results"]["habits-list"]["errors"], 0)
+        self.assertEqual(reports["reminders"]["results"]["messages"], 5)
+        comparison = compare_results(reports["api"], reports["api"])
+        self.assertEqual(comparison["habits-list"]["p50_ms"]["change_pct"], 0)
+
+    def test_profile_startup(self):
+        """Тестирование профиля холодного старта по модулям"""
+
+        with tempfile.TemporaryDirectory() as output:
+            call_command("profile_startup", "config.wsgi", top=3, output=output, stdout=StringIO())
+            report = json.loads(next(Path(output).iterdir()).read_text())
+        result = report["results"]["config.wsgi"]
+        self.assertEqual(len(result["slowest_modules_ms"]), 3)
+        self.assertIn("django", result["packages_ms"])
+
+
+class HabitQueryPlanTestCase(APITestCase):
+    """Горячие запросы должны идти по индексам, а не полным сканированием таблицы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            [User(email=f"user_{index}@example.com") for index in range(50)]
+        )
+        now = timezone.now()
+        habits = Habit.objects.bulk_create(
+            [
+                Habit(
+                    user=users[index % len(users)],
+                    place="test_place",
+                    time="08:00",
+                    action="test_action",
+                    time_to_complete=60,
+                    is_published=index % 10 == 0,
+                    next_fire_at=now + timedelta(minutes=index),
+                )
+                for index in range(5000)
+            ]
+        )
+        ReminderDelivery.objects.bulk_create(
+            [
+                ReminderDelivery(
+                    habit=habit,
+                    scheduled_at=habit.next_fire_at,
+                    status=ReminderDelivery.SENT if index % 50 else ReminderDelivery.PENDING,
+                )
+                for index, habit in enumerate(habits)
+            ]
+        )
+        cls.user = users[0]
+        cls.now = now
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        if connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan", plan)
+        else:
+            # Полный обход таблицы в плане SQLite — строка «SCAN <таблица>» без индекса
+            self.assertNotRegex(plan, r"(?m)\bSCAN \w+$")
+
+    def test_user_habits_page_uses_index(self):
+        """Тестирование плана запроса списка привычек пользователя"""
+
+        queryset = Habit.objects.filter(user=self.user).order_by("id")
+        self.assertUsesIndex(queryset[:6], "habit_user_id_idx")
+        self.assertUsesIndex(queryset.filter(id__gt=2500)[:6], "habit_user_id_idx")
+
+    def test_public_habits_page_uses_partial_index(self):
+        """Тестирование плана запроса публичной ленты"""
+
+        queryset = Habit.objects.filter(is_published=True).order_by("id")
+        self.assertUsesIndex(queryset[:6], "habit_published_idx")
+        self.assertUsesIndex(queryset.filter(id__gt=2500)[:6], "habit_published_idx")
+
+    def test_reminder_tick_uses_index(self):
+        """Тестирование планов запросов тика рассылки"""
+
+        self.assertUsesIndex(
+            Habit.objects.filter(next_fire_at__lte=self.now + timedelta(minutes=5)),
+            "next_fire_at",
+        )
+        self.assertUsesIndex(ReminderDelivery.objects.pending(), "delivery_status_idx")
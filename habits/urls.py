@@ -1,22 +1,58 @@
+from django.conf import settings
 from django.urls import path
 
 from habits.apps import HabitsConfig
+from habits.async_views import HabitListAsyncView, HabitRetrieveAsyncView, PublishedHabitListAsyncView
 from habits.views import (
+    HabitBulkAPIView,
+    HabitCompletionAPIView,
+    HabitExportAPIView,
+    HabitExportDownloadAPIView,
+    HabitExportRetrieveAPIView,
     HabitCreateAPIView,
     HabitListAPIView,
     HabitRetrieveAPIView,
     HabitUpdateAPIView,
     HabitDestroyAPIView,
     PublishedHabitListAPIView,
+    PublicFeedCacheStatsAPIView,
+    ReminderLoadAPIView,
+    ReminderStatsAPIView,
 )
 
 app_name = HabitsConfig.name
 
+# Под ASGI эндпоинты чтения обслуживаются асинхронными представлениями с тем же форматом ответа
+if settings.ASYNC_READ_VIEWS:
+    habit_list_view = HabitListAsyncView.as_view()
+    public_habit_list_view = PublishedHabitListAsyncView.as_view()
+    habit_detail_view = HabitRetrieveAsyncView.as_view()
+else:
+    habit_list_view = HabitListAPIView.as_view()
+    public_habit_list_view = PublishedHabitListAPIView.as_view()
+    habit_detail_view = HabitRetrieveAPIView.as_view()
+
 urlpatterns = [
     path("create/", HabitCreateAPIView.as_view(), name="create-habit"),
-    path("", HabitListAPIView.as_view(), name="habits-list"),
-    path("public/list/", PublishedHabitListAPIView.as_view(), name="public-habits"),
-    path("<int:pk>/", HabitRetrieveAPIView.as_view(), name="habit-detail"),
+    path("", habit_list_view, name="habits-list"),
+    path("bulk/", HabitBulkAPIView.as_view(), name="habits-bulk"),
+    path("public/list/", public_habit_list_view, name="public-habits"),
+    path(
+        "public/list/cache-stats/",
+        PublicFeedCacheStatsAPIView.as_view(),
+        name="public-habits-cache-stats",
+    ),
+    path("export/<str:file_format>/", HabitExportAPIView.as_view(), name="habit-export"),
+    path("export/jobs/<int:pk>/", HabitExportRetrieveAPIView.as_view(), name="habit-export-detail"),
+    path(
+        "export/jobs/<int:pk>/download/",
+        HabitExportDownloadAPIView.as_view(),
+        name="habit-export-download",
+    ),
+    path("ops/stats/", ReminderStatsAPIView.as_view(), name="reminder-stats"),
+    path("ops/reminder-load/", ReminderLoadAPIView.as_view(), name="reminder-load"),
+    path("<int:pk>/", habit_detail_view, name="habit-detail"),
     path("<int:pk>/update/", HabitUpdateAPIView.as_view(), name="habit-update"),
     path("<int:pk>/delete/", HabitDestroyAPIView.as_view(), name="habit-delete"),
+    path("<int:pk>/completions/", HabitCompletionAPIView.as_view(), name="habit-completions"),
 ]
@@ -40,8 +40,9 @@ class PleasantHabitRelatedValidator:
         self.field2 = field2
 
     def __call__(self, instance):
-        if instance.get(self.field1):
-            if not instance.get(self.field2):
+        related_habit = instance.get(self.field1)
+        if related_habit:
+            if not getattr(related_habit, self.field2):
                 raise ValidationError(
                     "У связанной привычки должен быть указан признак приятной привычки."
                 )
@@ -1,10 +1,122 @@
+import hashlib
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from habits.models import Habit
-from habits.paginators import MyPagination
-from habits.serializers import HabitSerializer
+from habits.analytics import get_reminder_load
+from habits.cache import (
+    PUBLIC_FEED_VERSION_KEY,
+    get_version,
+    habit_version_key,
+    invalidate_user_habits,
+    public_feed_cache,
+    user_habits_version_key,
+)
+from habits.completions import complete_habit
+from habits.exports import (
+    CONTENT_TYPES,
+    get_export_queryset,
+    iter_csv,
+    iter_habit_rows,
+    iter_jsonl,
+    parquet_available,
+)
+from habits.models import (
+    Habit,
+    HabitCompletion,
+    HabitExport,
+    ReminderDelivery,
+    ReminderTick,
+    TelegramDeadLetter,
+)
+from habits.paginators import CompletionCursorPagination, MyCursorPagination
+from habits.serializers import (
+    HabitBulkSerializer,
+    HabitCompletionSerializer,
+    HabitExportSerializer,
+    HabitSerializer,
+    ReminderTickSerializer,
+    get_expand_fields,
+)
 from habits.permissions import IsOwner
+from habits.scheduler import schedule_feed
+from habits.services import telegram_circuit
+from habits.tasks import export_habits
+
+
+def make_etag(version, request):
+    """Слабый ETag ответа: версия данных, пользователь и полный адрес с параметрами"""
+
+    source = f"{version}:{request.user.pk}:{request.get_full_path()}"
+    return f'W/"{hashlib.md5(source.encode()).hexdigest()}"'
+
+
+def etag_matches(etag, request):
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def public_feed_cache_key(request, version):
+    """Ключ страницы публичной ленты: версия ленты, хост и отсортированные параметры запроса"""
+
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return f"{version}:{request.get_host()}:{params}"
+
+
+class ConditionalGetMixin:
+    """Слабый ETag по версии данных из кэша и ответ 304 Not Modified.
+
+    Версия хранится в кэше и меняется сигналами привычек, поэтому совпадение
+    проверяется без обращения к строкам в БД.
+    """
+
+    def get_etag_version(self):
+        raise NotImplementedError
+
+    def get_etag(self):
+        version = self.get_etag_version()
+        if version is None:
+            return None
+        return make_etag(version, self.request)
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+        if etag_matches(etag, request):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response = super().get(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+
+class ExpandMixin:
+    """Подгружает развёрнутые через ?expand связи одним JOIN вместо запроса на строку"""
+
+    public_feed = False
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        expand = get_expand_fields(self.request, self.public_feed)
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return queryset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "public_feed": self.public_feed}
 
 
 class HabitCreateAPIView(generics.CreateAPIView):
@@ -16,32 +128,60 @@ class HabitCreateAPIView(generics.CreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class HabitListAPIView(generics.ListAPIView):
+class HabitListAPIView(ConditionalGetMixin, ExpandMixin, generics.ListAPIView):
     """Эндпоинт списка привычек"""
 
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
-    pagination_class = MyPagination
+    pagination_class = MyCursorPagination
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
 
+    def get_etag_version(self):
+        return get_version(user_habits_version_key(self.request.user.pk))
 
-class PublishedHabitListAPIView(generics.ListAPIView):
+
+class PublishedHabitListAPIView(ExpandMixin, generics.ListAPIView):
     """Эндпоинт списка публичных привычек"""
 
     queryset = Habit.objects.filter(is_published=True)
     serializer_class = HabitSerializer
-    pagination_class = MyPagination
+    pagination_class = MyCursorPagination
     permission_classes = (AllowAny,)
+    public_feed = True
+
+    def list(self, request, *args, **kwargs):
+        # Страница ленты кэшируется целиком; версия меняется при любом изменении публичных привычек
+        key = public_feed_cache_key(request, get_version(PUBLIC_FEED_VERSION_KEY))
+        data = public_feed_cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            public_feed_cache.set(key, data)
+        return Response(data)
 
 
-class HabitRetrieveAPIView(generics.RetrieveAPIView):
+class PublicFeedCacheStatsAPIView(APIView):
+    """Эндпоинт статистики попаданий в кэш публичной ленты"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(public_feed_cache.stats())
+
+
+class HabitRetrieveAPIView(ConditionalGetMixin, ExpandMixin, generics.RetrieveAPIView):
     """Эндпоинт просмотра привычки"""
 
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
 
+    def get_etag_version(self):
+        # Версия владельца неизвестна без чтения строки, поэтому с ?expand=user 304 не отдаём
+        if "user" in get_expand_fields(self.request):
+            return None
+        return get_version(habit_version_key(self.kwargs["pk"]))
+
 
 class HabitUpdateAPIView(generics.UpdateAPIView):
     """Эндпоинт изменения привычки"""
@@ -56,3 +196,288 @@ class HabitDestroyAPIView(generics.DestroyAPIView):
 
     queryset = Habit.objects.all()
     permission_classes = (IsOwner,)
+
+
+class HabitCompletionAPIView(generics.ListCreateAPIView):
+    """Эндпоинт отметки выполнения привычки и истории выполнений"""
+
+    serializer_class = HabitCompletionSerializer
+    pagination_class = CompletionCursorPagination
+    permission_classes = (IsOwner,)
+
+    def get_habit(self):
+        habit = get_object_or_404(Habit.objects.only("id", "user"), pk=self.kwargs["pk"])
+        self.check_object_permissions(self.request, habit)
+        return habit
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return HabitCompletion.objects.none()
+        return HabitCompletion.objects.filter(habit=self.get_habit())
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        habit, completion, created = complete_habit(
+            self.get_habit().pk, serializer.validated_data.get("completed_at")
+        )
+        return Response(
+            {
+                "completion": self.get_serializer(completion).data,
+                "streak": habit.get_current_streak(),
+                "completed_periods": habit.completed_periods,
+                "completion_rate": habit.get_completion_rate(),
+                "last_completed_at": habit.last_completed_at,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+BULK_DELETE_REQUEST = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=["ids"],
+    properties={"ids": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER))},
+)
+BULK_DELETE_RESPONSE = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        "deleted": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+        "errors": openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            description="Ошибки по идентификаторам, которые не удалось удалить",
+            additional_properties=openapi.Schema(type=openapi.TYPE_STRING),
+        ),
+    },
+)
+
+
+class HabitBulkAPIView(generics.GenericAPIView):
+    """Эндпоинт пакетного создания, изменения и удаления привычек.
+
+    Пакет обрабатывается целиком в одной транзакции: при ошибке хотя бы в одном
+    элементе ничего не сохраняется, а в ответе возвращаются ошибки по каждому элементу.
+    """
+
+    queryset = Habit.objects.all()
+    serializer_class = HabitBulkSerializer
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Habit.objects.none()
+        return self.queryset.filter(user=self.request.user)
+
+    def get_item_ids(self, key):
+        ids = set()
+        if isinstance(self.request.data, list):
+            for item in self.request.data:
+                try:
+                    ids.add(int(item.get(key)))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+        return ids
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if getattr(self, "swagger_fake_view", False):
+            return context
+        # Все связанные привычки пакета загружаются одним запросом и только среди своих
+        context["related_habits"] = self.get_queryset().in_bulk(
+            self.get_item_ids("related_habit")
+        )
+        return context
+
+    @swagger_auto_schema(
+        request_body=HabitBulkSerializer(many=True),
+        responses={status.HTTP_201_CREATED: HabitBulkSerializer(many=True)},
+    )
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            habits = serializer.save(user=request.user)
+        invalidate_user_habits(request.user.pk, [habit.pk for habit in habits])
+        schedule_feed.publish([(habit.pk, habit.next_fire_at) for habit in habits])
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        request_body=HabitBulkSerializer(many=True),
+        responses={status.HTTP_200_OK: HabitBulkSerializer(many=True)},
+    )
+    def patch(self, request):
+        instances = self.get_queryset().in_bulk(self.get_item_ids("id"))
+        serializer = self.get_serializer(
+            instances, data=request.data, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            habits = serializer.save()
+        invalidate_user_habits(request.user.pk, [habit.pk for habit in habits])
+        schedule_feed.publish([(habit.pk, habit.next_fire_at) for habit in habits])
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        request_body=BULK_DELETE_REQUEST,
+        responses={status.HTTP_200_OK: BULK_DELETE_RESPONSE},
+    )
+    def delete(self, request):
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response(
+                {"ids": ["Ожидается список идентификаторов привычек."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        with transaction.atomic():
+            habits = self.get_queryset().filter(pk__in=ids)
+            found = set(habits.values_list("pk", flat=True))
+            # QuerySet.delete отправляет post_delete для каждой привычки, и сигнал сам сообщает планировщику
+            habits.delete()
+        return Response(
+            {
+                "deleted": sorted(found),
+                "errors": {pk: "Привычка не найдена." for pk in ids if pk not in found},
+            }
+        )
+
+
+class ReminderStatsAPIView(APIView):
+    """Эндпоинт телеметрии рассылки напоминаний для эксплуатации"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        ticks = ReminderTick.objects.order_by("-started_at")[:20]
+        last_day = ReminderTick.objects.filter(
+            started_at__gte=timezone.now() - timedelta(days=1)
+        )
+        latency = ReminderDelivery.objects.send_latency(timezone.now() - timedelta(days=1))
+        return Response(
+            {
+                "ticks": ReminderTickSerializer(ticks, many=True).data,
+                "last_day": {
+                    **last_day.aggregate(
+                        ticks=Count("id"),
+                        sent=Sum("sent"),
+                        failed=Sum("failed"),
+                        max_duration=Max("duration"),
+                        max_lag=Max("lag_max"),
+                    ),
+                    "overran_ticks": last_day.filter(
+                        duration__gt=settings.REMINDER_TICK_INTERVAL.total_seconds()
+                    ).count(),
+                },
+                "backlog": ReminderDelivery.objects.backlog(),
+                "dead_letters": TelegramDeadLetter.objects.count(),
+                "telegram_circuit": telegram_circuit.state(),
+                "send_latency": {
+                    key: value.total_seconds() if value is not None else None
+                    for key, value in latency.items()
+                },
+                "public_feed_cache": public_feed_cache.stats(),
+            }
+        )
+
+
+class HabitExportAPIView(APIView):
+    """Эндпоинт выгрузки привычек.
+
+    GET отдаёт CSV или JSONL потоком через серверный курсор, POST ставит
+    выгрузку в любом формате (в том числе Parquet) в очередь Celery.
+    """
+
+    STREAMING_FORMATS = ("csv", "jsonl")
+
+    def get(self, request, file_format):
+        if file_format not in self.STREAMING_FORMATS:
+            return Response(
+                {"detail": "Потоковая выгрузка доступна в CSV и JSONL, остальные форматы — через POST."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows = iter_habit_rows(get_export_queryset(request.user))
+        lines = iter_csv(rows) if file_format == "csv" else iter_jsonl(rows)
+        response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="habits.{file_format}"'
+        return response
+
+    def post(self, request, file_format):
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {"detail": f"Неизвестный формат выгрузки: {file_format}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if file_format == "parquet" and not parquet_available():
+            # Иначе задача была бы принята и заведомо завершилась ошибкой
+            return Response(
+                {"detail": "Выгрузка в Parquet недоступна: на сервере не установлен pyarrow."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        export = HabitExport.objects.create(user=request.user, file_format=file_format)
+        export_habits.delay(export.pk)
+        export.refresh_from_db()
+        serializer = HabitExportSerializer(export, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class HabitExportRetrieveAPIView(generics.RetrieveAPIView):
+    """Эндпоинт статуса фоновой выгрузки"""
+
+    serializer_class = HabitExportSerializer
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return HabitExport.objects.none()
+        return HabitExport.objects.filter(user=self.request.user)
+
+
+class HabitExportDownloadAPIView(generics.GenericAPIView):
+    """Эндпоинт скачивания готовой выгрузки"""
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return HabitExport.objects.none()
+        return HabitExport.objects.filter(user=self.request.user, status=HabitExport.DONE)
+
+    @swagger_auto_schema(
+        operation_id="habits_export_jobs_download",
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                "Файл выгрузки", schema=openapi.Schema(type=openapi.TYPE_FILE)
+            )
+        },
+    )
+    def get(self, request, pk):
+        export = self.get_object()
+        if not export.file:
+            raise Http404
+        try:
+            file = export.file.open("rb")
+        except FileNotFoundError:
+            # Файл удалён из хранилища или записан туда, куда этот процесс не видит
+            raise Http404
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=f"habits.{export.file_format}",
+            content_type=CONTENT_TYPES[export.file_format],
+        )
+
+
+class ReminderLoadAPIView(APIView):
+    """Гистограмма нагрузки напоминаний по времени суток для планирования мощности"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        resolution = request.query_params.get("resolution", "minute")
+        if resolution not in ("minute", "hour"):
+            return Response(
+                {"resolution": "Допустимые значения: minute, hour"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        load = get_reminder_load(resolution)
+        slot_minutes = 60 if resolution == "hour" else 1
+        return Response(
+            {
+                **load,
+                "telegram_limit_per_slot": settings.TELEGRAM_RATE_LIMIT * 60 * slot_minutes,
+            }
+        )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import TelegramUpdate, User
 
 
 # Register your models here.
@@ -11,3 +11,9 @@ class AdminUser(admin.ModelAdmin):
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.exclude(is_superuser=True)
+
+
+@admin.register(TelegramUpdate)
+class TelegramUpdateAdmin(admin.ModelAdmin):
+    list_display = ("update_id", "received_at", "processed_at")
+    list_filter = ("processed_at",)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Поля пользователя, которые хранятся в кэше аутентификации; остальные догружаются при обращении
+SNAPSHOT_FIELDS = ("id", "is_active", "is_staff", "is_superuser")
+
+
+def user_cache_key(user_id):
+    return f"users:auth:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация, которая кратковременно кэширует снимок пользователя.
+
+    В кэше лежат только id, флаги доступа и отпечаток хэша пароля, а не весь
+    пользователь. Сигналы сбрасывают запись при сохранении и удалении, а
+    изменения в обход сигналов (QuerySet.update) вступают в силу не позже
+    чем через AUTH_USER_CACHE_TIMEOUT секунд.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        key = user_cache_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            user = super().get_user(validated_token)
+            snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+            snapshot["password_marker"] = get_md5_hash_password(user.password)
+            cache.set(key, snapshot, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        if api_settings.CHECK_USER_IS_ACTIVE and not snapshot["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != snapshot["password_marker"]
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return self.user_from_snapshot(snapshot)
+
+    def user_from_snapshot(self, snapshot):
+        """Пользователь из снимка; незакэшированные поля отложены и читаются из БД при обращении"""
+
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in snapshot]
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, fields, [snapshot[field] for field in fields])
@@ -0,0 +1,35 @@
+import requests
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from habits.services import get_telegram_timeout, get_telegram_url
+
+
+class Command(BaseCommand):
+    help = "Регистрирует вебхук бота в Telegram (или удаляет его с --delete)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default=settings.TELEGRAM_WEBHOOK_URL, help="Публичный адрес вебхука")
+        parser.add_argument("--max-connections", type=int, default=40, help="Параллельных запросов от Telegram")
+        parser.add_argument("--delete", action="store_true", help="Удалить вебхук")
+
+    def handle(self, *args, **options):
+        if options["delete"]:
+            method, payload = "deleteWebhook", {}
+        else:
+            if not options["url"] or not settings.TELEGRAM_WEBHOOK_SECRET:
+                raise CommandError("Нужны адрес вебхука (--url или TELEGRAM_WEBHOOK_URL) и TELEGRAM_WEBHOOK_SECRET")
+            method, payload = "setWebhook", {
+                "url": options["url"],
+                "secret_token": settings.TELEGRAM_WEBHOOK_SECRET,
+                "allowed_updates": ["message"],
+                "max_connections": options["max_connections"],
+            }
+        try:
+            response = requests.post(get_telegram_url(method), json=payload, timeout=get_telegram_timeout())
+            result = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise CommandError(f"Не удалось вызвать {method}: {exc}")
+        if not result.get("ok"):
+            raise CommandError(f"Telegram отклонил {method}: {result.get('description')}")
+        self.stdout.write(self.style.SUCCESS(f"{method}: {result.get('description', 'ok')}"))
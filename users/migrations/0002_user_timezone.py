@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 13:49
+
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="timezone",
+            field=models.CharField(
+                default="UTC",
+                help_text="Часовой пояс IANA, например Europe/Moscow",
+                max_length=63,
+                validators=[users.models.validate_timezone],
+                verbose_name="Часовой пояс",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_timezone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TelegramUpdate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "update_id",
+                    models.BigIntegerField(unique=True, verbose_name="ID обновления"),
+                ),
+                ("payload", models.JSONField(verbose_name="Содержимое")),
+                (
+                    "received_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Получено"),
+                ),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True, db_index=True, null=True, verbose_name="Обработано"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Обновление Telegram",
+                "verbose_name_plural": "Обновления Telegram",
+            },
+        ),
+    ]
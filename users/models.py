@@ -1,7 +1,15 @@
+from zoneinfo import ZoneInfo, available_timezones
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 
+def validate_timezone(value):
+    if value not in available_timezones():
+        raise ValidationError(f"Неизвестный часовой пояс: {value}")
+
+
 class User(AbstractUser):
     username = None
     email = models.EmailField(
@@ -24,6 +32,13 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    timezone = models.CharField(
+        max_length=63,
+        default="UTC",
+        validators=[validate_timezone],
+        verbose_name="Часовой пояс",
+        help_text="Часовой пояс IANA, например Europe/Moscow",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -31,6 +46,33 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Значения на момент загрузки нужны сигналам, чтобы заметить смену часового пояса
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def zoneinfo(self):
+        return ZoneInfo(self.timezone)
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+
+
+class TelegramUpdate(models.Model):
+    """Входящее обновление Telegram, принятое вебхуком и ожидающее обработки"""
+
+    update_id = models.BigIntegerField(unique=True, verbose_name="ID обновления")
+    payload = models.JSONField(verbose_name="Содержимое")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Получено")
+    processed_at = models.DateTimeField(verbose_name="Обработано", blank=True, null=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Обновление Telegram"
+        verbose_name_plural = "Обновления Telegram"
+
+    def __str__(self):
+        return f"{self.update_id}"
@@ -13,3 +13,11 @@ class UserSerializer(serializers.ModelSerializer):
             "groups",
             "user_permissions",
         )
+
+
+class UserPublicSerializer(serializers.ModelSerializer):
+    """Открытые данные пользователя для вложения в другие ответы"""
+
+    class Meta:
+        model = User
+        fields = ("id", "first_name", "last_name", "city", "avatar")
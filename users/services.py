@@ -0,0 +1,28 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def link_code_key(code):
+    return f"users:telegram:link:{code}"
+
+
+def create_link_code(user_id):
+    """Одноразовый код для привязки Telegram по ссылке t.me/<бот>?start=<код>"""
+
+    code = secrets.token_urlsafe(16)
+    cache.set(link_code_key(code), user_id, settings.TELEGRAM_LINK_CODE_TTL)
+    return code
+
+
+def get_start_code(update):
+    """Код из команды /start <код> в обновлении Telegram и chat id отправителя"""
+
+    message = update.get("message") or {}
+    text = message.get("text") or ""
+    chat_id = (message.get("chat") or {}).get("id")
+    command, _, code = text.partition(" ")
+    if command.split("@")[0] != "/start" or not code.strip() or chat_id is None:
+        return None, None
+    return code.strip(), str(chat_id)
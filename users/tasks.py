@@ -0,0 +1,77 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from habits.services import send_telegram_messages
+from users.models import TelegramUpdate, User
+from users.services import get_start_code, link_code_key
+
+logger = logging.getLogger(__name__)
+
+UPDATES_SCHEDULED_KEY = "users:telegram:updates_scheduled"
+
+
+def schedule_update_processing():
+    """Ставит одну задачу обработки на пачку обновлений, пришедших за TELEGRAM_UPDATES_BATCH_DELAY"""
+
+    if cache.add(UPDATES_SCHEDULED_KEY, 1, settings.TELEGRAM_UPDATES_BATCH_DELAY * 10):
+        process_telegram_updates.apply_async(countdown=settings.TELEGRAM_UPDATES_BATCH_DELAY)
+
+
+@shared_task
+def process_telegram_updates():
+    """Пакетная обработка обновлений Telegram: привязка чатов по одноразовым кодам"""
+
+    cache.delete(UPDATES_SCHEDULED_KEY)
+    processed = 0
+    while True:
+        with transaction.atomic():
+            updates = list(
+                TelegramUpdate.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .order_by("update_id")[: settings.TELEGRAM_UPDATES_BATCH_SIZE]
+            )
+            if not updates:
+                break
+            replies = link_chats(updates)
+            TelegramUpdate.objects.filter(pk__in=[update.pk for update in updates]).update(
+                processed_at=timezone.now()
+            )
+        processed += len(updates)
+        if replies:
+            send_telegram_messages(replies)
+
+    TelegramUpdate.objects.filter(processed_at__lt=timezone.now() - timedelta(days=7)).delete()
+    return processed
+
+
+def link_chats(updates):
+    """Привязывает чаты к пользователям по кодам из /start; возвращает ответы для отправки"""
+
+    starts = {}
+    for update in updates:
+        code, chat_id = get_start_code(update.payload)
+        if code:
+            starts[link_code_key(code)] = chat_id
+    if not starts:
+        return []
+    user_ids = cache.get_many(starts)
+    # Код одноразовый: удаляется сразу, даже если пользователь уже не существует
+    cache.delete_many(user_ids)
+    users = User.objects.in_bulk(user_ids.values())
+    replies = []
+    for key, chat_id in starts.items():
+        user = users.get(user_ids.get(key))
+        if user is None:
+            replies.append((chat_id, "Ссылка для привязки устарела, получите новую в приложении."))
+            continue
+        user.tg_chat_id = chat_id
+        user.save(update_fields=["tg_chat_id"])
+        replies.append((chat_id, "Telegram привязан, напоминания о привычках будут приходить сюда."))
+    logger.info("Привязано чатов Telegram: %s", sum(key in user_ids for key in starts))
+    return replies
@@ -1,7 +1,16 @@
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from users.models import User
+from habits.models import TelegramDeadLetter
+from users.authentication import user_cache_key
+from users.models import TelegramUpdate, User
 
 
 class UserAPITestCase(APITestCase):
@@ -32,3 +41,118 @@ class UserAPITestCase(APITestCase):
         """Тестирование удаления пользователя"""
         response = self.client.delete(f"/users/{self.user.pk}/delete/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET="secret", TELEGRAM_BOT_USERNAME="habits_bot")
+class TelegramWebhookTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@example.com")
+
+    def post_update(self, update_id, text, secret="secret"):
+        update = {"update_id": update_id, "message": {"chat": {"id": 777}, "text": text}}
+        return self.client.post(
+            "/users/telegram/webhook/", update, format="json", HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret
+        )
+
+    def test_webhook_rejects_wrong_secret(self):
+        """Тестирование отказа вебхука без верного секрета"""
+
+        response = self.post_update(1, "/start code", secret="wrong")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(TelegramUpdate.objects.exists())
+
+    @patch("users.tasks.send_telegram_messages")
+    def test_link_chat_by_one_time_code(self, send_mock):
+        """Тестирование привязки чата по одноразовой ссылке"""
+
+        TelegramDeadLetter.objects.create(chat_id="777", status_code=403)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post("/users/telegram/link/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        code = response.data["code"]
+        self.assertEqual(response.data["url"], f"https://t.me/habits_bot?start={code}")
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.post_update(10, f"/start {code}").status_code, status.HTTP_200_OK)
+        self.post_update(10, f"/start {code}")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.tg_chat_id, "777")
+        self.assertEqual(TelegramUpdate.objects.filter(processed_at__isnull=False).count(), 1)
+        self.assertFalse(TelegramDeadLetter.objects.filter(chat_id="777").exists())
+
+        # Повторное использование кода ничего не привязывает
+        other = User.objects.create(email="other@example.com", tg_chat_id="1")
+        self.post_update(11, f"/start {code}")
+        other.refresh_from_db()
+        self.assertEqual(other.tg_chat_id, "1")
+        self.assertEqual(len(send_mock.call_args.args[0]), 1)
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@example.com")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_user_is_cached_between_requests(self):
+        """Тестирование аутентификации без запроса пользователя к БД"""
+
+        with self.assertNumQueries(2):
+            self.client.get(f"/users/{self.user.pk}/")
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/users/{self.user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_invalidated_on_deactivation(self):
+        """Тестирование сброса кэша при деактивации и удалении пользователя"""
+
+        self.client.get(f"/users/{self.user.pk}/")
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(f"/users/{self.user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_holds_lean_snapshot(self):
+        """Тестирование того, что в кэше нет хэша пароля и полей профиля"""
+
+        self.client.get(f"/users/{self.user.pk}/")
+        snapshot = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(set(snapshot), {"id", "is_active", "is_staff", "is_superuser", "password_marker"})
+        self.assertNotIn(self.user.password, snapshot.values())
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=30)
+    def test_bulk_deactivation_applies_after_timeout(self):
+        """Тестирование деактивации через QuerySet.update в обход сигналов"""
+
+        self.client.get(f"/users/{self.user.pk}/")
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with patch("time.time", return_value=time.time() + 31):
+            response = self.client.get(f"/users/{self.user.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserQueryPlanTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            [User(email=f"user_{index}@example.com") for index in range(2000)]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def test_login_lookup_uses_index(self):
+        """Тестирование плана запроса пользователя по email при входе"""
+
+        plan = User.objects.filter(email="user_100@example.com").explain()
+        if connection.vendor == "postgresql":
+            self.assertIn("users_user_email_key", plan)
+            self.assertNotIn("Seq Scan", plan)
+        else:
+            # Уникальный индекс по email SQLite создаёт сам под именем sqlite_autoindex_*
+            self.assertRegex(
+                plan, r"SEARCH users_user USING (COVERING )?INDEX sqlite_autoindex_users_user_\d+ \(email=\?\)"
+            )
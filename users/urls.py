@@ -10,6 +10,8 @@ from users.views import (
     UserRetrieveAPIView,
     UserUpdateAPIView,
     UserDestroyAPIView,
+    TelegramLinkAPIView,
+    TelegramWebhookAPIView,
 )
 
 app_name = UsersConfig.name
@@ -21,4 +23,6 @@ urlpatterns = [
     path("login/", TokenObtainPairView.as_view(), name="login"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("<int:pk>/delete/", UserDestroyAPIView.as_view(), name="delete"),
+    path("telegram/link/", TelegramLinkAPIView.as_view(), name="telegram-link"),
+    path("telegram/webhook/", TelegramWebhookAPIView.as_view(), name="telegram-webhook"),
 ]
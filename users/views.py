@@ -1,8 +1,15 @@
-from rest_framework import generics
+import hmac
+
+from django.conf import settings
+from rest_framework import generics, status
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from users.models import User
+from users.models import TelegramUpdate, User
 from users.serializers import UserSerializer
+from users.services import create_link_code
+from users.tasks import schedule_update_processing
 
 
 class UserCreateAPIView(generics.CreateAPIView):
@@ -28,3 +35,43 @@ class UserUpdateAPIView(generics.UpdateAPIView):
 
 class UserDestroyAPIView(generics.DestroyAPIView):
     queryset = User.objects.all()
+
+
+class TelegramLinkAPIView(APIView):
+    """Выдаёт одноразовую ссылку на бота для привязки Telegram к текущему пользователю"""
+
+    def post(self, request):
+        code = create_link_code(request.user.pk)
+        return Response(
+            {
+                "code": code,
+                "url": f"https://t.me/{settings.TELEGRAM_BOT_USERNAME}?start={code}",
+                "expires_in": settings.TELEGRAM_LINK_CODE_TTL,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class TelegramWebhookAPIView(APIView):
+    """Вебхук Telegram: проверяет секрет, сохраняет обновление и сразу отвечает.
+
+    Обработка идёт пачками в Celery, поэтому всплеск регистраций не занимает веб-воркеры.
+    """
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        secret = settings.TELEGRAM_WEBHOOK_SECRET
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secret or not hmac.compare_digest(token.encode(), secret.encode()):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        update_id = request.data.get("update_id") if isinstance(request.data, dict) else None
+        if not isinstance(update_id, int):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        # Telegram повторяет доставку, пока не получит 200: дубликаты отбрасываются по update_id
+        TelegramUpdate.objects.bulk_create(
+            [TelegramUpdate(update_id=update_id, payload=request.data)], ignore_conflicts=True
+        )
+        schedule_update_processing()
+        return Response(status=status.HTTP_200_OK)